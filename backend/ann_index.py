@@ -0,0 +1,105 @@
+import numpy as np
+
+ASSIGN_CHUNK_ROWS = 8192
+
+
+def assign_to_centroids(matrix: np.ndarray, centroids: np.ndarray) -> np.ndarray:
+    """Index of the highest-dot-product centroid for every row, computed in chunks."""
+    labels = np.empty(len(matrix), dtype=np.intp)
+    for start in range(0, len(matrix), ASSIGN_CHUNK_ROWS):
+        labels[start:start + ASSIGN_CHUNK_ROWS] = np.argmax(
+            matrix[start:start + ASSIGN_CHUNK_ROWS] @ centroids.T, axis=1)
+    return labels
+
+
+def normalize_rows(matrix: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return (matrix / norms).astype(np.float32)
+
+
+def spherical_kmeans(matrix: np.ndarray, n_clusters: int, iterations: int = 10,
+                     sample_size: int = None, seed: int = 0) -> np.ndarray:
+    """Unit-norm k-means centroids for L2-normalized rows (cosine k-means, Lloyd iterations).
+
+    Trains on a random sample of at most `sample_size` rows (default 64 per
+    cluster); empty clusters are re-seeded from random sample rows.
+    """
+    rng = np.random.default_rng(seed)
+    n_clusters = min(n_clusters, len(matrix))
+    sample_size = min(len(matrix), sample_size or 64 * n_clusters)
+    sample = matrix[rng.choice(len(matrix), sample_size, replace=False)]
+    centroids = sample[rng.choice(len(sample), n_clusters, replace=False)].astype(np.float32)
+
+    for _ in range(iterations):
+        labels = assign_to_centroids(sample, centroids)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, labels, sample)
+        counts = np.bincount(labels, minlength=n_clusters)
+        empty = counts == 0
+        sums[empty] = sample[rng.choice(len(sample), int(empty.sum()))]
+        centroids = normalize_rows(sums)
+    return centroids
+
+
+class CentroidRouter:
+    """Rows partitioned into groups, each with a unit-norm centroid.
+
+    A query scores the centroids, then collects rows group by group, closest
+    first: at least `n_probe` groups, and more while fewer than `min_rows`
+    rows pass the request's filter mask.
+    """
+
+    def __init__(self, centroids: np.ndarray, labels: np.ndarray, names: tuple = None):
+        self.names = names  # optional label of each group (e.g. category)
+        self.centroids = np.ascontiguousarray(centroids, dtype=np.float32)
+        order = np.argsort(labels, kind="stable")
+        self.rows = order.astype(np.intp)  # rows grouped by label, ascending within a group
+        self.offsets = np.searchsorted(labels[order], np.arange(len(centroids) + 1))
+
+    @classmethod
+    def from_arrays(cls, centroids: np.ndarray, rows: np.ndarray, offsets: np.ndarray, names: tuple = None):
+        """Rebuild a router from saved arrays (e.g. memory-mapped) without regrouping."""
+        router = cls.__new__(cls)
+        router.names, router.centroids, router.rows, router.offsets = names, centroids, rows, offsets
+        return router
+
+    def __len__(self):
+        return len(self.centroids)
+
+    def group_sizes(self) -> np.ndarray:
+        return np.diff(self.offsets)
+
+    def route(self, query: np.ndarray, n_probe: int, mask: np.ndarray = None, min_rows: int = 0) -> np.ndarray:
+        """Sorted candidate rows (filtered by mask) from the closest groups."""
+        visited, eligible, collected = 0, 0, []
+        for group in np.argsort(-(self.centroids @ query), kind="stable"):
+            if visited >= n_probe and eligible >= min_rows:
+                break
+            rows = self.rows[self.offsets[group]:self.offsets[group + 1]]
+            if mask is not None:
+                rows = rows[mask[rows]]
+            collected.append(rows)
+            eligible += len(rows)
+            visited += 1
+        return np.sort(np.concatenate(collected)) if collected else np.empty(0, dtype=np.intp)
+
+    def freeze(self):
+        for array in (self.centroids, self.rows, self.offsets):
+            array.flags.writeable = False
+
+
+def build_ivf(matrix: np.ndarray, n_lists: int = 0, seed: int = 0) -> CentroidRouter:
+    """Inverted-file index: k-means coarse centroids (default sqrt(n) lists) over normalized rows."""
+    n_lists = n_lists or max(1, int(np.sqrt(len(matrix))))
+    centroids = spherical_kmeans(matrix, n_lists, seed=seed)
+    return CentroidRouter(centroids, assign_to_centroids(matrix, centroids))
+
+
+def build_category_router(matrix: np.ndarray, categories) -> CentroidRouter:
+    """One group per program category, centred on the normalized mean of its programs."""
+    codes = {}
+    labels = np.array([codes.setdefault(c, len(codes)) for c in categories], dtype=np.intp)
+    sums = np.zeros((len(codes), matrix.shape[1]), dtype=np.float32)
+    np.add.at(sums, labels, matrix)
+    return CentroidRouter(normalize_rows(sums), labels, names=tuple(codes))
@@ -0,0 +1,43 @@
+import os
+import time
+
+import numpy as np
+
+import embedding
+
+# CONFIG
+BULK_BATCH_SIZE = int(os.getenv("BULK_BATCH_SIZE", "64"))
+
+
+def length_buckets(texts: list[str], batch_size: int) -> list[np.ndarray]:
+    """Positions of texts grouped into batches of similar length (longest first)."""
+    order = np.argsort([-len(t) for t in texts], kind="stable")
+    return [order[i:i + batch_size] for i in range(0, len(order), batch_size)]
+
+
+def encode_bulk(texts: list[str], encoder=embedding, batch_size: int = None, report: bool = True) -> np.ndarray:
+    """Encode many texts, one forward pass per length bucket, returned in input order.
+
+    Each bucket is padded only to its own longest text, so a few long program
+    descriptions don't inflate every batch. `encoder` is anything with
+    SentenceTransformer's encode(texts, batch_size=...), the embedding module by default.
+    """
+    batch_size = batch_size or BULK_BATCH_SIZE
+    if not texts:
+        return np.zeros((0, 0), dtype=np.float32)
+
+    start = time.perf_counter()
+    buckets = length_buckets(texts, batch_size)
+    vectors = None
+    for positions in buckets:
+        encoded = np.asarray(encoder.encode([texts[i] for i in positions], batch_size=len(positions)),
+                             dtype=np.float32)
+        if vectors is None:
+            vectors = np.empty((len(texts), encoded.shape[1]), dtype=np.float32)
+        vectors[positions] = encoded
+    elapsed = time.perf_counter() - start
+
+    if report:
+        print(f"⚡ Encoded {len(texts)} texts in {len(buckets)} length bucket(s) of ≤{batch_size} "
+              f"in {elapsed:.1f}s ({len(texts) / max(elapsed, 1e-9):.1f} texts/s)")
+    return vectors
@@ -0,0 +1,262 @@
+import hashlib
+import json
+import os
+import re
+import shutil
+import threading
+import time
+from datetime import datetime
+
+import embedding
+from db import db  # shared DB connection
+from program_index import ProgramIndex
+
+# CONFIG
+CORPUS_VERSION_ID = "program_index"
+CORPUS_COLLECTIONS = ("program_vectors", "school_rankings", "grade_profiles")
+CORPUS_POLL_SECONDS = float(os.getenv("CORPUS_POLL_SECONDS", "5"))
+INDEX_RETRIEVAL = os.getenv("INDEX_RETRIEVAL", "exact").lower()  # "exact", "ivf" or "category"
+IVF_LISTS = int(os.getenv("IVF_LISTS", "0"))  # 0 = sqrt(number of programs)
+IVF_PROBES = int(os.getenv("IVF_PROBES", "8"))
+ANN_MIN_PROGRAMS = int(os.getenv("ANN_MIN_PROGRAMS", "5000"))  # smaller corpora use exact scoring (ivf)
+CATEGORY_PROBES = int(os.getenv("CATEGORY_PROBES", "2"))  # categories fully scored per query
+INDEX_STORAGE = os.getenv("INDEX_STORAGE", "float32").lower()  # "float32", "float16" or "int8"
+RESCORE_CANDIDATES = int(os.getenv("RESCORE_CANDIDATES", "0"))  # >0: exact float32 rescoring of the top N
+PCA_DIMENSIONS = int(os.getenv("PCA_DIMENSIONS", "0"))  # >0: serve PCA-reduced vectors (e.g. 256)
+SERVING_BUNDLE_DIR = os.getenv("SERVING_BUNDLE_DIR") or None  # unset: always build from Mongo
+BUNDLE_KEEP = int(os.getenv("BUNDLE_KEEP", "3"))  # newest bundle versions kept on disk
+
+# The published snapshot. Readers take one reference and keep using it for the
+# whole request; publishing a new snapshot is a single reference assignment.
+_snapshot = None
+_last_check = 0.0
+_rebuild_thread = None
+_initial_lock = threading.Lock()
+
+
+def bump_corpus_version():
+    """Record that the corpus changed so every worker rebuilds its index.
+
+    Every writer of program_vectors, school_rankings or grade_profiles calls
+    this (server.py does the same for uploads); the fingerprint stored with
+    the version is what serving bundles are checked against.
+    """
+    db["corpus_versions"].update_one(
+        {"_id": CORPUS_VERSION_ID},
+        {"$inc": {"version": 1}, "$set": {"updated_at": datetime.utcnow(), "fingerprint": corpus_fingerprint()}},
+        upsert=True,
+    )
+
+
+def read_corpus_version() -> int:
+    doc = db["corpus_versions"].find_one({"_id": CORPUS_VERSION_ID}, {"version": 1})
+    return doc.get("version", 0) if doc else 0
+
+
+def read_corpus_fingerprint():
+    """Fingerprint recorded by the last bump_corpus_version() (None before the first one)."""
+    doc = db["corpus_versions"].find_one({"_id": CORPUS_VERSION_ID}, {"fingerprint": 1})
+    return doc.get("fingerprint") if doc else None
+
+
+def corpus_fingerprint() -> str:
+    """Cheap summary of the corpus collections: count, newest _id and newest updated_at of each.
+
+    Computed by writers when they bump the version, never by a booting worker.
+    """
+    parts = []
+    for name in CORPUS_COLLECTIONS:
+        collection = db[name]
+        newest = collection.find_one({}, {"_id": 1}, sort=[("_id", -1)])
+        updated = collection.find_one({"updated_at": {"$exists": True}}, {"updated_at": 1}, sort=[("updated_at", -1)])
+        parts.append(f"{name}:{collection.count_documents({})}:{newest and newest.get('_id')}:"
+                     f"{updated and updated.get('updated_at')}")
+    return hashlib.sha256("|".join(parts).encode()).hexdigest()
+
+
+def read_corpus():
+    """Programs, rankings and grade profiles as stored in Mongo."""
+    program_data = list(db["program_vectors"].find({}))
+    rankings_doc = db["school_rankings"].find_one({}, {"_id": 0})
+    grade_profiles = list(db["grade_profiles"].find({}, {"_id": 0}))
+
+    rankings_data = rankings_doc["programs"] if rankings_doc and "programs" in rankings_doc else {}
+    return program_data, rankings_data, grade_profiles
+
+
+def index_options() -> dict:
+    """ProgramIndex build options for this deployment."""
+    return {"retrieval": INDEX_RETRIEVAL, "ivf_lists": IVF_LISTS, "ivf_probes": IVF_PROBES,
+            "ann_min_programs": ANN_MIN_PROGRAMS, "category_probes": CATEGORY_PROBES,
+            "storage": INDEX_STORAGE, "rescore_candidates": RESCORE_CANDIDATES, "pca_dimensions": PCA_DIMENSIONS}
+
+
+def build_index(version: int = 0, **options) -> ProgramIndex:
+    """Build a fresh snapshot from Mongo; keyword options override index_options()."""
+    program_data, rankings_data, grade_profiles = read_corpus()
+    return ProgramIndex(program_data, rankings_data, grade_profiles, version=version,
+                        embedding_model=embedding.EMBEDDING_MODEL, **{**index_options(), **options})
+
+
+def bundle_path(version: int) -> str:
+    return os.path.join(SERVING_BUNDLE_DIR, f"v{version}")
+
+
+def write_bundle(snapshot: ProgramIndex, fingerprint, replace: bool = False) -> str:
+    """Save a snapshot as the serving bundle for its corpus version (atomic directory rename).
+
+    `fingerprint` is the read_corpus_fingerprint() taken before the snapshot was read.
+    """
+    path = bundle_path(snapshot.version)
+    if os.path.isdir(path) and not replace:
+        return path
+    os.makedirs(SERVING_BUNDLE_DIR, exist_ok=True)
+    tmp = f"{path}.tmp-{os.getpid()}-{threading.get_ident()}"
+    snapshot.save_bundle(tmp)
+    with open(os.path.join(tmp, "options.json"), "w") as f:
+        json.dump({**index_options(), "embedding_model": snapshot.embedding_model,
+                   "corpus_fingerprint": fingerprint}, f)
+    if replace and os.path.isdir(path):
+        shutil.rmtree(path)
+    try:
+        os.rename(tmp, path)
+    except OSError:  # another worker published this version first
+        shutil.rmtree(tmp, ignore_errors=True)
+    _prune_bundles()
+    return path
+
+
+def _prune_bundles():
+    names = (re.fullmatch(r"v(\d+)", name) for name in os.listdir(SERVING_BUNDLE_DIR))
+    versions = sorted(int(m.group(1)) for m in names if m)
+    # Workers still mapping a removed bundle keep reading it: unlinked files live until unmapped
+    for version in versions[:-BUNDLE_KEEP]:
+        shutil.rmtree(bundle_path(version), ignore_errors=True)
+
+
+def open_bundle(version: int, fingerprint):
+    """Memory-mapped snapshot for this version, or None when no usable bundle exists.
+
+    A bundle is only used when its index settings, embedding model and the
+    corpus fingerprint recorded with the version all match, so a bundle left
+    over from another database or a reset version counter is never served.
+    """
+    path = bundle_path(version)
+    if not os.path.isdir(path):
+        return None
+    try:
+        with open(os.path.join(path, "options.json")) as f:
+            options = json.load(f)
+        stored_fingerprint = options.pop("corpus_fingerprint", None)
+        expected = {**index_options(), "embedding_model": embedding.canonical_model_name(embedding.EMBEDDING_MODEL)}
+        if options != expected:
+            print(f"⚠️ Serving bundle {path} was built with different index settings; building from Mongo")
+            return None
+        if stored_fingerprint != fingerprint:
+            print(f"⚠️ Serving bundle {path} was built from a different corpus; building from Mongo")
+            return None
+        start = time.perf_counter()
+        snapshot = ProgramIndex.from_bundle(path)
+    except (OSError, ValueError, KeyError) as e:
+        print(f"⚠️ Could not open serving bundle {path} ({e}); building from Mongo")
+        return None
+    print(f"📦 Memory-mapped program index v{version} from {path} "
+          f"({len(snapshot)} programs, {time.perf_counter() - start:.3f}s)")
+    return snapshot
+
+
+def load_index(version: int = 0, **options) -> ProgramIndex:
+    """Snapshot for a corpus version.
+
+    With SERVING_BUNDLE_DIR set, a bundle for that version is memory-mapped
+    (shared page cache across workers); otherwise the snapshot is built from
+    Mongo and saved as the bundle for the next worker. Keyword options (used
+    by the report tools) always build from Mongo.
+    """
+    if options or not SERVING_BUNDLE_DIR:
+        return build_index(version, **options)
+    fingerprint = read_corpus_fingerprint()
+    snapshot = open_bundle(version, fingerprint)
+    if snapshot is None:
+        snapshot = build_index(version)
+        try:
+            # Replace an unusable one; taken before the build, a write racing it only costs a rebuild later
+            write_bundle(snapshot, fingerprint, replace=os.path.isdir(bundle_path(version)))
+        except OSError as e:
+            print(f"⚠️ Could not write serving bundle: {e}")
+    return snapshot
+
+
+def publish(snapshot: ProgramIndex):
+    """Make a snapshot visible to new requests (atomic reference swap)."""
+    global _snapshot
+    _snapshot = snapshot
+
+
+def _rebuild(version: int):
+    try:
+        snapshot = load_index(version)
+        publish(snapshot)
+        print(f"🔄 Published program index v{version} ({len(snapshot)} programs, {snapshot.build_seconds}s)")
+    except Exception as e:
+        print(f"❌ Program index rebuild failed, keeping the previous index: {e}")
+
+
+def get_index() -> ProgramIndex:
+    """Current program index snapshot.
+
+    The first call builds it synchronously. After that the corpus version is
+    polled at most every CORPUS_POLL_SECONDS; when it moved, a background
+    thread builds a new snapshot while callers keep getting the previous one.
+    """
+    global _last_check, _rebuild_thread
+    snapshot = _snapshot
+    if snapshot is None:
+        with _initial_lock:
+            if _snapshot is None:
+                publish(load_index(read_corpus_version()))
+                _last_check = time.monotonic()
+        return _snapshot
+
+    now = time.monotonic()
+    if now - _last_check >= CORPUS_POLL_SECONDS:
+        _last_check = now
+        try:
+            version = read_corpus_version()
+        except Exception as e:
+            print(f"⚠️ Could not read corpus version: {e}")
+            return snapshot
+        if version != snapshot.version and not (_rebuild_thread and _rebuild_thread.is_alive()):
+            _rebuild_thread = threading.Thread(target=_rebuild, args=(version,), daemon=True)
+            _rebuild_thread.start()
+    return snapshot
+
+
+def quarantine_report() -> list[dict]:
+    """Validation problems found while building the published snapshot."""
+    snapshot = _snapshot
+    return list(snapshot.quarantine) if snapshot is not None else []
+
+
+def status() -> dict:
+    """Published snapshot version and build timing, for monitoring."""
+    snapshot = _snapshot
+    rebuilding = bool(_rebuild_thread and _rebuild_thread.is_alive())
+    if snapshot is None:
+        return {"loaded_version": None, "programs": 0, "rebuilding": rebuilding}
+    return {
+        "loaded_version": snapshot.version,
+        "built_at": snapshot.built_at.isoformat(),
+        "build_seconds": snapshot.build_seconds,
+        "embedding_model": snapshot.embedding_model,
+        "dimension": snapshot.dim,
+        "serving_dimension": snapshot.matrix.shape[1],
+        "pca_explained_variance": snapshot.pca_explained_variance,
+        "retrieval": snapshot.retrieval,
+        "bundle": snapshot.bundle_path,
+        "storage": snapshot.storage,
+        "matrix_bytes": snapshot.matrix_bytes(),
+        "programs": len(snapshot),
+        "quarantined": snapshot.quarantined_count,
+        "rebuilding": rebuilding,
+    }
@@ -0,0 +1,114 @@
+"""Thread sizing for the encoder and BLAS, so several API workers per node don't oversubscribe the CPUs.
+
+The CPUs this process may use (affinity mask, capped by a cgroup CPU quota) are
+split evenly across WEB_CONCURRENCY workers. Each worker then runs torch with
+that many intra-op threads and one inter-op thread, and caps BLAS / OpenMP
+pools to the same count. Explicit OMP_NUM_THREADS etc. in the environment win.
+"""
+import math
+import os
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# CONFIG
+WEB_CONCURRENCY = int(os.getenv("WEB_CONCURRENCY", "1"))  # uvicorn --workers reads the same variable
+ENCODER_THREADS = int(os.getenv("ENCODER_THREADS", "0"))  # intra-op threads per worker, 0 = auto
+ENCODER_INTEROP_THREADS = int(os.getenv("ENCODER_INTEROP_THREADS", "1"))
+
+BLAS_ENV_VARS = ("OMP_NUM_THREADS", "OPENBLAS_NUM_THREADS", "MKL_NUM_THREADS",
+                 "VECLIB_MAXIMUM_THREADS", "NUMEXPR_NUM_THREADS")
+
+_defaulted = set()  # BLAS_ENV_VARS set by apply() rather than by the user; later apply() calls may resize them
+
+
+def cgroup_cpu_limit():
+    """CPU quota of this container (e.g. 2.5), or None when unlimited / not in a cgroup."""
+    try:  # cgroup v2
+        with open("/sys/fs/cgroup/cpu.max") as f:
+            quota, period = f.read().split()
+        return None if quota == "max" else int(quota) / int(period)
+    except (OSError, ValueError):
+        pass
+    try:  # cgroup v1
+        with open("/sys/fs/cgroup/cpu/cpu.cfs_quota_us") as f:
+            quota = int(f.read())
+        with open("/sys/fs/cgroup/cpu/cpu.cfs_period_us") as f:
+            period = int(f.read())
+        return None if quota <= 0 else quota / period
+    except (OSError, ValueError):
+        return None
+
+
+def available_cpus() -> int:
+    """CPUs this process can actually use: affinity mask, capped by the cgroup quota."""
+    try:
+        cpus = len(os.sched_getaffinity(0))
+    except AttributeError:  # not available on macOS / Windows
+        cpus = os.cpu_count() or 1
+    quota = cgroup_cpu_limit()
+    if quota is not None:
+        cpus = min(cpus, max(1, math.floor(quota)))
+    return cpus
+
+
+def plan(workers: int = None, threads: int = None) -> dict:
+    """Thread layout for one worker out of `workers` sharing this node's CPUs."""
+    workers = max(1, workers or WEB_CONCURRENCY)
+    cpus = available_cpus()
+    intra = threads or ENCODER_THREADS or max(1, cpus // workers)
+    return {
+        "cpus": cpus,
+        "cgroup_quota": cgroup_cpu_limit(),
+        "workers": workers,
+        "intra_op_threads": intra,
+        "inter_op_threads": ENCODER_INTEROP_THREADS,
+        "blas_threads": intra,
+    }
+
+
+def apply(workers: int = None, threads: int = None) -> dict:
+    """Size BLAS pools for this process and log the layout; torch is sized when the model loads."""
+    layout = plan(workers, threads)
+    for var in BLAS_ENV_VARS:
+        if var not in os.environ or var in _defaulted:
+            os.environ[var] = str(layout["blas_threads"])
+            _defaulted.add(var)
+    layout["blas_threads"] = int(os.environ["OMP_NUM_THREADS"])
+
+    # Env vars only reach BLAS libraries loaded after this point; resize any already loaded
+    try:
+        from threadpoolctl import threadpool_limits
+
+        threadpool_limits(limits=layout["blas_threads"], user_api="blas")
+    except ImportError:
+        pass
+
+    print(f"🧵 CPU layout: {layout['cpus']} CPU(s) (cgroup quota {layout['cgroup_quota']}) / "
+          f"{layout['workers']} worker(s) -> {layout['intra_op_threads']} intra-op, "
+          f"{layout['inter_op_threads']} inter-op, {layout['blas_threads']} BLAS thread(s) per worker")
+    return layout
+
+
+def configure_torch():
+    """Apply the layout to torch; call before the model runs its first forward pass."""
+    import torch
+
+    torch.set_num_threads(LAYOUT["intra_op_threads"])
+    try:
+        torch.set_num_interop_threads(LAYOUT["inter_op_threads"])
+    except RuntimeError:  # can only be set once, before any inter-op work
+        pass
+
+
+def onnx_session_options():
+    import onnxruntime
+
+    options = onnxruntime.SessionOptions()
+    options.intra_op_num_threads = LAYOUT["intra_op_threads"]
+    options.inter_op_num_threads = LAYOUT["inter_op_threads"]
+    return options
+
+
+LAYOUT = apply()
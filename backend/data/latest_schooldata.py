@@ -1,5 +1,10 @@
 from sentence_transformers import SentenceTransformer
 import json
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))  # backend/
+from bulk_encode import encode_bulk
 
 programs = [
    
@@ -7656,9 +7661,13 @@ programs = [
     }
 ]
 
-model = SentenceTransformer("all-mpnet-base-v2")
-for p in programs:
-    p["vector"] = model.encode(p["description"]).tolist()
+# Same setting the API uses, so stored vectors match the serving model
+model_name = os.getenv("EMBEDDING_MODEL", "sentence-transformers/all-mpnet-base-v2")
+model = SentenceTransformer(model_name)
+vectors = encode_bulk([p["description"] for p in programs], model)
+for p, vector in zip(programs, vectors):
+    p["vector"] = vector.tolist()
+    p["embedding_model"] = model_name
 
 with open("data/program_vectors.json", "w", encoding="utf-8") as f:
     json.dump(programs, f, indent=2)
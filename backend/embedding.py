@@ -0,0 +1,221 @@
+import gc
+import os
+import re
+import threading
+import time
+
+import numpy as np
+import psutil
+from dotenv import load_dotenv
+
+import cpu_layout
+
+load_dotenv()
+
+# CONFIG
+EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL", "sentence-transformers/all-mpnet-base-v2")
+EMBEDDING_DEVICE = os.getenv("EMBEDDING_DEVICE") or None  # None lets sentence-transformers pick
+EMBEDDING_BACKEND = os.getenv("EMBEDDING_BACKEND", "torch").lower()  # "torch" or "onnx"
+EMBEDDING_QUANTIZATION = os.getenv("EMBEDDING_QUANTIZATION", "none").lower()  # "none" or "int8" (torch only)
+ONNX_MODEL_DIR = os.getenv("ONNX_MODEL_DIR", "cache/onnx")
+EMBEDDING_SELF_CHECK = os.getenv("EMBEDDING_SELF_CHECK", "1") == "1"
+EMBEDDING_SIDECAR_SOCKET = os.getenv("EMBEDDING_SIDECAR_SOCKET") or None  # unset: load the model in-process
+
+# ONNX embeddings must agree with PyTorch to within this cosine distance
+# (1 - cosine) on every probe sentence, otherwise we fall back to PyTorch.
+ONNX_COSINE_TOLERANCE = 1e-3
+
+PROBE_SENTENCES = [
+    "Mathematics ICT",
+    "Information Technology Engineering",
+    "Problem-solving Researching/Analyzing",
+    "Improving lives Driving innovation",
+    "Corporate office Collaborative team setting",
+    "I want to design buildings and work on construction projects outdoors",
+    "The Bachelor of Science in Nursing prepares students for patient care in hospitals and clinics.",
+]
+
+# Vectors stored before documents were tagged with "embedding_model" came from this model
+LEGACY_EMBEDDING_MODEL = "sentence-transformers/all-mpnet-base-v2"
+
+
+def canonical_model_name(name: str) -> str:
+    """'all-mpnet-base-v2' and 'sentence-transformers/all-mpnet-base-v2' name the same model."""
+    name = (name or LEGACY_EMBEDDING_MODEL).strip()
+    return name if "/" in name else f"sentence-transformers/{name}"
+
+
+_model = None
+_model_lock = threading.Lock()
+_model_stats = {}
+
+
+def _onnx_export_path() -> str:
+    return os.path.join(ONNX_MODEL_DIR, re.sub(r"[^A-Za-z0-9_.-]+", "__", EMBEDDING_MODEL))
+
+
+def quantize_int8(model):
+    """Dynamic int8 quantization of every nn.Linear layer, in place (CPU only).
+
+    Weights are stored as int8 and activations are quantized on the fly, so no
+    calibration data is needed.
+    """
+    import torch
+
+    return torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8, inplace=True)
+
+
+def model_size_bytes(model) -> int:
+    """Serialized state_dict size; unlike parameters(), this counts packed int8 weights (report tools only)."""
+    import io
+
+    import torch
+
+    buffer = io.BytesIO()
+    torch.save(model.state_dict(), buffer)
+    return buffer.tell()
+
+
+def _tensor_bytes(tensor) -> int:
+    return tensor.numel() * tensor.element_size()
+
+
+def _weights_bytes(model, backend: str) -> int:
+    """Weight memory of the loaded encoder, measured without serializing it.
+
+    Parameters and buffers, plus the packed weights of int8 Linear layers
+    (which parameters() does not see); the exported .onnx files for ONNX.
+    """
+    if backend == "onnx":
+        return sum(os.path.getsize(os.path.join(root, name))
+                   for root, _, names in os.walk(_onnx_export_path()) for name in names if name.endswith(".onnx"))
+    import torch
+
+    total = sum(_tensor_bytes(t) for t in model.parameters()) + sum(_tensor_bytes(t) for t in model.buffers())
+    for module in model.modules():
+        if isinstance(module, torch.ao.nn.quantized.dynamic.Linear):
+            weight, bias = module._weight_bias()
+            total += _tensor_bytes(weight) + (_tensor_bytes(bias) if bias is not None else 0)
+    return total
+
+
+def _load_torch(quantization: str = "none"):
+    from sentence_transformers import SentenceTransformer
+
+    if quantization == "int8":
+        return quantize_int8(SentenceTransformer(EMBEDDING_MODEL, device="cpu"))
+    return SentenceTransformer(EMBEDDING_MODEL, device=EMBEDDING_DEVICE)
+
+
+def _load_onnx():
+    """SentenceTransformer running on ONNX Runtime's CPU provider.
+
+    The first load exports the model to ONNX and saves it under ONNX_MODEL_DIR;
+    later loads reuse the exported files. Needs `pip install sentence-transformers[onnx]`.
+    """
+    from sentence_transformers import SentenceTransformer
+
+    path = _onnx_export_path()
+    exported = os.path.isdir(path)
+    model = SentenceTransformer(
+        path if exported else EMBEDDING_MODEL,
+        device="cpu",
+        backend="onnx",
+        model_kwargs={"provider": "CPUExecutionProvider", "session_options": cpu_layout.onnx_session_options()},
+    )
+    if not exported:
+        model.save_pretrained(path)
+        print(f"📦 Exported {EMBEDDING_MODEL} to ONNX at {path}")
+    return model
+
+
+def compare_backends(model, reference, sentences=PROBE_SENTENCES) -> dict:
+    """Cosine agreement between two encoders on fixed probe sentences."""
+    a = np.asarray(model.encode(sentences), dtype=np.float64)
+    b = np.asarray(reference.encode(sentences), dtype=np.float64)
+    cosine = (a * b).sum(axis=1) / (np.linalg.norm(a, axis=1) * np.linalg.norm(b, axis=1))
+    max_distance = float(1.0 - cosine.min())
+    return {"min_cosine": float(cosine.min()), "max_distance": max_distance,
+            "passed": max_distance <= ONNX_COSINE_TOLERANCE}
+
+
+def _load_model():
+    if EMBEDDING_BACKEND != "onnx":
+        if EMBEDDING_QUANTIZATION == "int8":
+            return _load_torch("int8"), "torch-int8"
+        return _load_torch(), "torch"
+
+    try:
+        model = _load_onnx()
+    except Exception as e:  # optimum / onnxruntime missing or export failed
+        print(f"⚠️ ONNX backend unavailable ({e}); using PyTorch")
+        return _load_torch(), "torch"
+
+    if EMBEDDING_SELF_CHECK:
+        reference = _load_torch()
+        check = compare_backends(model, reference)
+        _model_stats["self_check"] = check
+        if not check["passed"]:
+            print(f"❌ ONNX self-check failed (cosine distance {check['max_distance']:.2e} > "
+                  f"{ONNX_COSINE_TOLERANCE:.0e}); using PyTorch")
+            return reference, "torch"
+        print(f"✅ ONNX self-check passed (max cosine distance {check['max_distance']:.2e})")
+        del reference
+        gc.collect()
+    return model, "onnx"
+
+
+def get_model():
+    """Return the process-wide SentenceTransformer, loading it on first use."""
+    global _model
+    if _model is None:
+        with _model_lock:
+            if _model is None:
+                process = psutil.Process()
+                rss_before = process.memory_info().rss
+                start = time.perf_counter()
+                cpu_layout.configure_torch()
+                model, backend = _load_model()
+                _model_stats.update({
+                    "backend": backend,
+                    "load_seconds": round(time.perf_counter() - start, 3),
+                    "rss_delta_bytes": process.memory_info().rss - rss_before,
+                    "model_bytes": _weights_bytes(model, backend),
+                    "threads": cpu_layout.LAYOUT,
+                })
+                _model = model
+                print(f"🧠 Loaded embedding model {EMBEDDING_MODEL} ({backend}) on {model.device} "
+                      f"in {_model_stats['load_seconds']}s")
+    return _model
+
+
+def encode(texts, **kwargs):
+    """Encode one text or a list of texts with the shared model (sidecar or in-process)."""
+    if EMBEDDING_SIDECAR_SOCKET:
+        from embedding_sidecar import client
+
+        return client().encode(texts, **kwargs)
+    return encode_local(texts, **kwargs)
+
+
+def encode_local(texts, **kwargs):
+    """Encode with this process's own model, never the sidecar."""
+    return get_model().encode(texts, **kwargs)
+
+
+def model_info() -> dict:
+    """Model identity plus load time and memory footprint, for sizing workers."""
+    if EMBEDDING_SIDECAR_SOCKET:
+        from embedding_sidecar import client
+
+        return {"sidecar": EMBEDDING_SIDECAR_SOCKET, **client().info()}
+
+    info = {"model_name": canonical_model_name(EMBEDDING_MODEL), "configured_backend": EMBEDDING_BACKEND, "loaded": _model is not None}
+    if _model is not None:
+        info.update({
+            "device": str(_model.device),
+            "dimension": _model.get_sentence_embedding_dimension(),
+            **_model_stats,
+            "process_rss_bytes": psutil.Process().memory_info().rss,
+        })
+    return info
@@ -0,0 +1,188 @@
+import asyncio
+import os
+import re
+import sqlite3
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+import embedding
+
+# CONFIG
+EMBEDDING_CACHE_SIZE = int(os.getenv("EMBEDDING_CACHE_SIZE", "4096"))  # in-memory entries, 0 disables the cache
+EMBEDDING_CACHE_PATH = os.getenv("EMBEDDING_CACHE_PATH") or None  # SQLite file for the on-disk tier
+
+
+def model_id() -> str:
+    """Identity of the vectors the active encoder produces: the sidecar's model, or this
+    process's model as actually loaded (after any ONNX -> PyTorch fallback)."""
+    info = embedding.model_info()
+    if "backend" not in info:  # in-process model not loaded yet
+        embedding.get_model()
+        info = embedding.model_info()
+    return f"{info['model_name']}|{info['backend']}"
+
+
+def normalize_text(text: str) -> str:
+    return re.sub(r"\s+", " ", text).strip()
+
+
+class EmbeddingCache:
+    """Answer-field embeddings keyed on (model id, normalized text).
+
+    A bounded LRU in memory, optionally backed by a SQLite file that survives
+    restarts. The model id is part of the on-disk key and rows written by any
+    other model are dropped the first time the file is used, so switching models
+    never serves stale vectors. All SQLite work from the event loop runs on the
+    cache's own single thread.
+    """
+
+    def __init__(self, max_entries: int, path: str = None):
+        self.max_entries = max_entries
+        self.model_id = None  # resolved on first disk access, once the encoder is up
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()  # memory tier and counters
+        self._db = None
+        self._db_lock = threading.Lock()  # one SQLite connection shared by the threads below
+        self._executor = None
+        if path:
+            self._db = sqlite3.connect(path, check_same_thread=False)
+            self._db.execute("CREATE TABLE IF NOT EXISTS embeddings "
+                             "(model TEXT, text TEXT, vector BLOB, PRIMARY KEY (model, text))")
+            self._db.commit()
+            # Disk reads and write-behind commits (fsync) run here, in order, never on the event loop
+            self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="embedding-cache")
+
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _remember(self, key: str, vector: np.ndarray):
+        self._memory[key] = vector
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+            self.evictions += 1
+
+    def _memory_lookup(self, keys: list[str]) -> dict:
+        found = {}
+        with self._lock:
+            for key in keys:
+                if key in self._memory:
+                    self._memory.move_to_end(key)
+                    found[key] = self._memory[key]
+                    self.hits += 1
+        return found
+
+    def _resolve_model_id(self):
+        """Key disk rows on the active encoder; drop rows any other model wrote (call with _db_lock held)."""
+        if self.model_id is None:
+            self.model_id = model_id()
+            self._db.execute("DELETE FROM embeddings WHERE model != ?", (self.model_id,))
+            self._db.commit()
+
+    def _disk_lookup(self, keys: list[str]) -> dict:
+        """Vectors for keys from the SQLite tier (blocking reads), promoted into memory; counts misses."""
+        rows = []
+        if self._db and keys:
+            with self._db_lock:
+                self._resolve_model_id()
+                rows = [self._db.execute("SELECT vector FROM embeddings WHERE model = ? AND text = ?",
+                                         (self.model_id, key)).fetchone() for key in keys]
+        found = {}
+        with self._lock:
+            for key, row in zip(keys, rows):
+                if row:
+                    vector = np.frombuffer(row[0], dtype=np.float32)
+                    self._remember(key, vector)
+                    found[key] = vector
+                    self.disk_hits += 1
+            self.misses += len(keys) - len(found)
+        return found
+
+    def _store(self, keys: list[str], vectors) -> list[tuple]:
+        """Put vectors in the memory tier; returns (key, bytes) rows for the disk tier."""
+        rows = []
+        with self._lock:
+            for key, vector in zip(keys, vectors):
+                vector = np.array(vector, dtype=np.float32)
+                vector.flags.writeable = False
+                self._remember(key, vector)
+                rows.append((key, vector.tobytes()))
+        return rows
+
+    def _write_disk(self, rows: list[tuple]):
+        with self._db_lock:
+            self._resolve_model_id()
+            self._db.executemany("INSERT OR REPLACE INTO embeddings VALUES (?, ?, ?)",
+                                 [(self.model_id, key, blob) for key, blob in rows])
+            self._db.commit()
+
+    def _write_behind(self, rows: list[tuple]):
+        if self._executor:
+            self._executor.submit(self._write_disk, rows)
+
+    @staticmethod
+    def _misses(texts: list[str], found: dict) -> dict:
+        """One representative text per uncached normalized key."""
+        missing = {}
+        for text in texts:
+            key = normalize_text(text)
+            if key not in found:
+                missing.setdefault(key, text)
+        return missing
+
+    def encode(self, texts: list[str], encode_fn) -> list:
+        """Vectors for texts, calling encode_fn (one batched call) only for the misses."""
+        keys = [normalize_text(t) for t in texts]
+        found = self._memory_lookup(list(dict.fromkeys(keys)))
+        found.update(self._disk_lookup([k for k in dict.fromkeys(keys) if k not in found]))
+        missing = self._misses(texts, found)
+        if missing:
+            vectors = encode_fn(list(missing.values()), batch_size=len(missing))
+            self._write_behind(self._store(list(missing), vectors))
+            found.update(zip(missing, vectors))
+        return [found[k] for k in keys]
+
+    async def encode_async(self, texts: list[str], encode_coro) -> list:
+        """encode() for coroutine encoders such as the micro-batching queue.
+
+        Only the in-memory tier is touched on the event loop; SQLite reads and
+        writes run on the cache's own thread.
+        """
+        keys = [normalize_text(t) for t in texts]
+        found = self._memory_lookup(list(dict.fromkeys(keys)))
+        uncached = [k for k in dict.fromkeys(keys) if k not in found]
+        if uncached:
+            if self._db:
+                loop = asyncio.get_running_loop()
+                found.update(await loop.run_in_executor(self._executor, self._disk_lookup, uncached))
+            else:
+                found.update(self._disk_lookup(uncached))
+        missing = self._misses(texts, found)
+        if missing:
+            vectors = await encode_coro(list(missing.values()))
+            self._write_behind(self._store(list(missing), vectors))
+            found.update(zip(missing, vectors))
+        return [found[k] for k in keys]
+
+    def metrics(self) -> dict:
+        lookups = self.hits + self.disk_hits + self.misses
+        return {
+            "enabled": True,
+            "model_id": self.model_id,
+            "entries": len(self._memory),
+            "max_entries": self.max_entries,
+            "on_disk": self._db is not None,
+            "hits": self.hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "hit_rate": round((self.hits + self.disk_hits) / lookups, 4) if lookups else 0.0,
+            "evictions": self.evictions,
+        }
+
+
+cache = EmbeddingCache(EMBEDDING_CACHE_SIZE, EMBEDDING_CACHE_PATH) if EMBEDDING_CACHE_SIZE > 0 else None
@@ -0,0 +1,166 @@
+"""Embedding sidecar: one process per node owns the model, API workers call it over a Unix socket.
+
+Start it next to the API workers and point them at the same socket:
+
+    python embedding_sidecar.py
+    EMBEDDING_SIDECAR_SOCKET=/tmp/unifinder-embedding.sock uvicorn main:app --workers 4
+
+Requests from every worker go through one EncoderBatcher, so concurrent searches
+share forward passes. Without EMBEDDING_SIDECAR_SOCKET, workers load the model
+in-process as before (development setup).
+
+Wire format, both directions: 4-byte big-endian length + JSON header. Encode
+responses are followed by the raw float32 matrix ("nbytes" long, row-major).
+"""
+import asyncio
+import json
+import os
+import socket
+import struct
+import threading
+
+import numpy as np
+
+import cpu_layout
+import embedding
+import encoder_queue
+
+DEFAULT_SOCKET = "/tmp/unifinder-embedding.sock"
+_LENGTH = struct.Struct(">I")
+
+
+# -----------------------------
+# SERVER
+# -----------------------------
+async def _read_header(reader: asyncio.StreamReader):
+    try:
+        (length,) = _LENGTH.unpack(await reader.readexactly(_LENGTH.size))
+    except asyncio.IncompleteReadError:
+        return None  # client closed the connection
+    return json.loads(await reader.readexactly(length))
+
+
+def _frame(header: dict) -> bytes:
+    payload = json.dumps(header).encode("utf-8")
+    return _LENGTH.pack(len(payload)) + payload
+
+
+async def _handle(reader, writer, batcher):
+    try:
+        while (request := await _read_header(reader)) is not None:
+            if request.get("op") == "info":
+                writer.write(_frame({**embedding.model_info(), "batching": batcher.metrics()}))
+            else:
+                try:
+                    vectors = np.ascontiguousarray(await batcher.encode(request["texts"]), dtype=np.float32)
+                except Exception as e:
+                    writer.write(_frame({"error": str(e)}))
+                else:
+                    writer.write(_frame({"shape": list(vectors.shape), "nbytes": vectors.nbytes}))
+                    writer.write(vectors.tobytes())
+            await writer.drain()
+    except ConnectionError:  # client went away mid-request (reset, broken pipe)
+        pass
+    finally:
+        writer.close()
+
+
+async def serve(path: str = DEFAULT_SOCKET):
+    embedding.EMBEDDING_SIDECAR_SOCKET = None  # this process owns the model
+    cpu_layout.LAYOUT = cpu_layout.apply(workers=1)  # the only encoder on the node gets every CPU
+    embedding.get_model()  # load before accepting connections
+    batcher = encoder_queue.EncoderBatcher(embedding.encode_local, encoder_queue.ENCODER_MAX_BATCH,
+                                           encoder_queue.ENCODER_MAX_WAIT_MS)
+    if os.path.exists(path):
+        os.unlink(path)
+    server = await asyncio.start_unix_server(lambda r, w: _handle(r, w, batcher), path=path)
+    print(f"🔌 Embedding sidecar listening on {path}")
+    async with server:
+        await server.serve_forever()
+
+
+# -----------------------------
+# CLIENT
+# -----------------------------
+class SidecarClient:
+    """Blocking client with one persistent connection per thread."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+
+    def _connection(self) -> socket.socket:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            try:
+                conn.connect(self.path)
+                self._check_model(conn)
+            except BaseException:
+                conn.close()
+                raise
+            self._local.conn = conn
+        return conn
+
+    def _check_model(self, conn):
+        """Refuse a sidecar serving a different model than this worker is configured for."""
+        header, _ = self._exchange(conn, {"op": "info"})
+        expected = embedding.canonical_model_name(embedding.EMBEDDING_MODEL)
+        if header.get("model_name") != expected:
+            raise RuntimeError(f"embedding sidecar at {self.path} serves {header.get('model_name')}, "
+                               f"but EMBEDDING_MODEL is {expected}; restart one of them with the same model")
+
+    def _recv_exactly(self, conn, size: int) -> bytes:
+        data = bytearray()
+        while len(data) < size:
+            chunk = conn.recv(size - len(data))
+            if not chunk:
+                raise ConnectionError("embedding sidecar closed the connection")
+            data += chunk
+        return bytes(data)
+
+    def _exchange(self, conn, request: dict):
+        conn.sendall(_frame(request))
+        (length,) = _LENGTH.unpack(self._recv_exactly(conn, _LENGTH.size))
+        header = json.loads(self._recv_exactly(conn, length))
+        payload = self._recv_exactly(conn, header["nbytes"]) if "nbytes" in header else None
+        return header, payload
+
+    def _call(self, request: dict):
+        for attempt in range(2):
+            try:
+                return self._exchange(self._connection(), request)
+            except OSError:
+                # Stale connection (e.g. sidecar restarted): close it and reconnect once
+                conn, self._local.conn = getattr(self._local, "conn", None), None
+                if conn is not None:
+                    conn.close()
+                if attempt:
+                    raise
+
+    def encode(self, texts, **kwargs):
+        """Same contract as SentenceTransformer.encode for a str or a list of str."""
+        single = isinstance(texts, str)
+        header, payload = self._call({"texts": [texts] if single else list(texts)})
+        if "error" in header:
+            raise RuntimeError(f"embedding sidecar error: {header['error']}")
+        vectors = np.frombuffer(payload, dtype=np.float32).reshape(header["shape"])
+        return vectors[0] if single else vectors
+
+    def info(self) -> dict:
+        header, _ = self._call({"op": "info"})
+        return header
+
+
+_client = None
+
+
+def client() -> SidecarClient:
+    global _client
+    if _client is None:
+        _client = SidecarClient(embedding.EMBEDDING_SIDECAR_SOCKET)
+    return _client
+
+
+if __name__ == "__main__":
+    asyncio.run(serve(os.getenv("EMBEDDING_SIDECAR_SOCKET") or DEFAULT_SOCKET))
@@ -0,0 +1,111 @@
+import asyncio
+import os
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+import numpy as np
+
+import embedding
+
+# CONFIG
+ENCODER_BATCHING = os.getenv("ENCODER_BATCHING", "1") == "1"
+ENCODER_MAX_BATCH = int(os.getenv("ENCODER_MAX_BATCH", "32"))  # texts per forward pass
+ENCODER_MAX_WAIT_MS = float(os.getenv("ENCODER_MAX_WAIT_MS", "5"))  # how long the first text may wait
+
+
+class EncoderBatcher:
+    """Coalesces encode requests from concurrent /search calls into shared forward passes.
+
+    Callers await encode(texts). A scheduler task takes the first pending request,
+    keeps collecting until the batch holds max_batch_size texts or max_wait_ms has
+    passed since that request arrived, then encodes everything in one call on a
+    dedicated thread and hands each caller its own rows back.
+    """
+
+    def __init__(self, encode_fn, max_batch_size: int, max_wait_ms: float):
+        self.encode_fn = encode_fn
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self._queue = None
+        self._task = None
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="encoder")
+
+        self.pending_texts = 0
+        self.batches = 0
+        self.texts_encoded = 0
+        self.recent_batch_sizes = deque(maxlen=1000)
+        self.recent_wait_ms = deque(maxlen=1000)
+
+    def _ensure_started(self):
+        if self._task is None or self._task.done():
+            self._queue = asyncio.Queue()
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def encode(self, texts: list[str]) -> np.ndarray:
+        self._ensure_started()
+        future = asyncio.get_running_loop().create_future()
+        self.pending_texts += len(texts)
+        await self._queue.put((texts, future, time.perf_counter()))
+        return await future
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            first = await self._queue.get()
+            batch, size = [first], len(first[0])
+            deadline = first[2] + self.max_wait
+            while size < self.max_batch_size:
+                timeout = deadline - time.perf_counter()
+                if timeout <= 0:
+                    break
+                try:
+                    item = await asyncio.wait_for(self._queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    break
+                batch.append(item)
+                size += len(item[0])
+
+            texts = [text for item_texts, _, _ in batch for text in item_texts]
+            flushed = time.perf_counter()
+            self.pending_texts -= size
+            try:
+                vectors = await loop.run_in_executor(
+                    self._executor, partial(self.encode_fn, texts, batch_size=len(texts))
+                )
+            except Exception as e:
+                for _, future, _ in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+
+            offset = 0
+            for item_texts, future, enqueued in batch:
+                if not future.done():
+                    future.set_result(vectors[offset:offset + len(item_texts)])
+                offset += len(item_texts)
+                self.recent_wait_ms.append((flushed - enqueued) * 1000)
+            self.batches += 1
+            self.texts_encoded += size
+            self.recent_batch_sizes.append(size)
+
+    def metrics(self) -> dict:
+        sizes = np.array(self.recent_batch_sizes or [0])
+        waits = np.array(self.recent_wait_ms or [0.0])
+        return {
+            "enabled": ENCODER_BATCHING,
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait * 1000,
+            "queue_depth_requests": self._queue.qsize() if self._queue else 0,
+            "queue_depth_texts": self.pending_texts,
+            "batches": self.batches,
+            "texts_encoded": self.texts_encoded,
+            "batch_size_mean": round(float(sizes.mean()), 2),
+            "batch_size_max": int(sizes.max()),
+            "wait_ms_p50": round(float(np.percentile(waits, 50)), 2),
+            "wait_ms_p99": round(float(np.percentile(waits, 99)), 2),
+        }
+
+
+batcher = EncoderBatcher(embedding.encode, ENCODER_MAX_BATCH, ENCODER_MAX_WAIT_MS)
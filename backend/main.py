@@ -27,9 +27,14 @@ from jose import JWTError, jwt
 from passlib.context import CryptContext
 import shutil
 
+import cpu_layout  # first: sizes BLAS / torch thread pools for this worker
+import corpus
+import embedding
+import embedding_cache
+import encoder_queue
+import readiness
 from db import db
-from recommendation import recommend
-from sentence_transformers import SentenceTransformer
+from recommendation import recommend_async, retrieval_metrics
 
 # -----------------------------
 # CONFIGURATION
@@ -43,7 +48,6 @@ ALLOWED_ORIGINS = os.getenv("ALLOWED_ORIGINS", "*").split(",")
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 security = HTTPBearer()
 
-embedding_model = SentenceTransformer("sentence-transformers/all-mpnet-base-v2")
 LOGO_FOLDER = "../frontend/public/logos"
 
 admin_token_blacklist = set()
@@ -66,6 +70,18 @@ app.add_middleware(
 )
 
 
+@app.on_event("startup")
+async def warm_up_encoder():
+    # Builds (or maps) the program index, loads the encoder and warms the search path in the background
+    readiness.start_warmup()
+
+
+@app.get("/ready", summary="Readiness probe for the load balancer")
+async def ready():
+    status_info = readiness.status()
+    return JSONResponse(status_code=200 if status_info["ready"] else 503, content=status_info)
+
+
 # -----------------------------
 # UTILS
 # -----------------------------
@@ -81,7 +97,7 @@ def serialize_doc(doc, remove_sensitive=True):
 def generate_vector(text: str):
     if not text:
         return []
-    return embedding_model.encode(text).tolist()
+    return embedding.encode(text).tolist()
 
 
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
@@ -275,12 +291,16 @@ async def search(
     user_email = current_user["email"] if current_user else "guest"
     start_time = time.time()
 
-    result = recommend(
+    max_budget = request_data.get("max_budget")
+    if max_budget is not None and (isinstance(max_budget, bool) or not isinstance(max_budget, (int, float))):
+        raise HTTPException(status_code=422, detail="max_budget must be a number")
+
+    result = await recommend_async(
         answers=request_data.get("answers", {}),
         user_grades=request_data.get("grades"),
         school_type=request_data.get("school_type", "any"),
         locations=request_data.get("locations"),
-        max_budget=request_data.get("max_budget"),
+        max_budget=max_budget,
     )
 
     elapsed_time = time.time() - start_time
@@ -295,7 +315,7 @@ async def search(
                 "filters": {
                     "school_type": request_data.get("school_type", "any"),
                     "locations": request_data.get("locations"),
-                    "max_budget": request_data.get("max_budget"),
+                    "max_budget": max_budget,
                 },
                 "result_type": result.get("type"),
                 "results": result.get("results", []),
@@ -469,6 +489,38 @@ async def get_activities(
     return [serialize_doc(a, remove_sensitive=False) for a in activities]
 
 
+@app.get("/admin/corpus")
+async def get_corpus_status(current_admin: dict = Depends(get_current_admin)):
+    return {"version": corpus.read_corpus_version(), **corpus.status()}
+
+
+@app.get("/admin/corpus/quarantine")
+async def get_corpus_quarantine(current_admin: dict = Depends(get_current_admin)):
+    return corpus.quarantine_report()
+
+
+@app.get("/admin/retrieval")
+async def get_retrieval_metrics(current_admin: dict = Depends(get_current_admin)):
+    return retrieval_metrics()
+
+
+@app.get("/admin/encoder-queue")
+async def get_encoder_queue_metrics(current_admin: dict = Depends(get_current_admin)):
+    return encoder_queue.batcher.metrics()
+
+
+@app.get("/admin/embedding-model")
+async def get_embedding_model_info(current_admin: dict = Depends(get_current_admin)):
+    return embedding.model_info()
+
+
+@app.get("/admin/embedding-cache")
+async def get_embedding_cache_metrics(current_admin: dict = Depends(get_current_admin)):
+    if embedding_cache.cache is None:
+        return {"enabled": False}
+    return embedding_cache.cache.metrics()
+
+
 # -----------------------------
 # ADMIN PROGRAM CRUD
 # -----------------------------
@@ -489,10 +541,13 @@ async def admin_create_program(
     collection = get_collection_by_type(program_type)
     if program_type == "program_vectors" and "description" in program:
         program["vector"] = generate_vector(program["description"])
+        program["embedding_model"] = embedding.canonical_model_name(embedding.EMBEDDING_MODEL)
     program["created_at"] = program["updated_at"] = datetime.utcnow()
     result = collection.insert_one(program)
     program["id"] = str(result.inserted_id)
     program.pop("_id", None)
+    if program_type == "program_vectors":
+        corpus.bump_corpus_version()
     log_activity(
         "Program Created",
         f"Program '{program.get('name')}' added",
@@ -520,8 +575,11 @@ async def admin_update_program(
         "description"
     ):
         updates["vector"] = generate_vector(updates["description"])
+        updates["embedding_model"] = embedding.canonical_model_name(embedding.EMBEDDING_MODEL)
     updates["updated_at"] = datetime.utcnow()
     collection.update_one({"_id": oid}, {"$set": updates})
+    if program_type == "program_vectors":
+        corpus.bump_corpus_version()
     updated = serialize_doc(collection.find_one({"_id": oid}))
     log_activity(
         "Program Updated",
@@ -544,6 +602,8 @@ async def admin_delete_program(
     if not program:
         raise HTTPException(status_code=404, detail="Program not found")
     collection.delete_one({"_id": oid})
+    if program_type == "program_vectors":
+        corpus.bump_corpus_version()
     log_activity(
         "Program Deleted",
         f"Program '{program.get('name')}' deleted",
@@ -0,0 +1,91 @@
+import os
+import threading
+
+import numpy as np
+
+import embedding
+from db import db  # shared DB connection
+
+# CONFIG
+OPTION_FAST_PATH = os.getenv("OPTION_FAST_PATH", "0") == "1"
+OPTION_COLLECTION = "option_embeddings"
+
+# Checkbox choices offered by the questionnaire (frontend/src/pages/UniFinder.jsx).
+# Keep in sync with the frontend, then rebuild: python -m tools.build_option_embeddings
+OPTION_PHRASES = {
+    "academics": [
+        "Mathematics", "Physics", "Chemistry", "Biology", "English", "History", "Geography", "Sports",
+        "Visual Arts", "Music", "Drama/Performing Arts", "ICT", "Economics", "Philosophy", "Languages",
+    ],
+    "fields": [
+        "Engineering", "Architecture", "Graphic Design", "Film & Animation", "Healthcare", "Education",
+        "Community & Social Work", "Law & Governance", "Information Technology", "Research & Development",
+        "Entrepreneurship", "Environmental Science",
+    ],
+    "activities": [
+        "Designing/Creating", "Problem-solving", "Writing/Storytelling", "Hands-on building/Repairing",
+        "Mentoring/Guiding others", "Researching/Analyzing", "Presenting/Speaking", "Organizing/Planning",
+        "Data Interpretation", "Experimenting/Testing", "Strategizing/Decision-making",
+    ],
+    "goals": [
+        "Improving lives", "Driving innovation", "Educating others", "Growing a business",
+        "Promoting fairness & justice", "Protecting the environment", "Mastering expertise in a field",
+        "Gaining recognition for work", "Creating sustainable solutions", "Building professional networks",
+    ],
+    "environment": [
+        "Corporate office", "Academic institution", "Hospital or clinic", "Outdoor/nature setting",
+        "Workshop or laboratory", "Creative studio", "Tech-driven workspace", "Remote/flexible work",
+        "Fast-paced/high-pressure environment", "Collaborative team setting", "Independent/solo projects",
+    ],
+}
+
+_table = None
+_table_lock = threading.Lock()
+
+
+def all_phrases() -> list[str]:
+    return list(dict.fromkeys(p for phrases in OPTION_PHRASES.values() for p in phrases))
+
+
+def build_table(encoder=embedding) -> dict:
+    """Encode every option phrase in one batch: phrase -> float32 vector."""
+    phrases = all_phrases()
+    vectors = encoder.encode(phrases, batch_size=len(phrases))
+    return {p: np.asarray(v, dtype=np.float32) for p, v in zip(phrases, vectors)}
+
+
+def load_table() -> dict:
+    """Stored option vectors produced by the configured model; others are ignored."""
+    model_name = embedding.canonical_model_name(embedding.EMBEDDING_MODEL)
+    table = {}
+    for doc in db[OPTION_COLLECTION].find({}, {"_id": 0}):
+        if embedding.canonical_model_name(doc.get("embedding_model")) == model_name:
+            table[doc["phrase"]] = np.asarray(doc["vector"], dtype=np.float32)
+    missing = len(all_phrases()) - len(table.keys() & set(all_phrases()))
+    if missing:
+        print(f"⚠️ {missing} option phrase(s) have no stored {model_name} vector and will be encoded "
+              "by the model (python -m tools.build_option_embeddings)")
+    return table
+
+
+def get_table() -> dict:
+    """Process-wide option vector table, read from Mongo on first use."""
+    global _table
+    if _table is None:
+        with _table_lock:
+            if _table is None:
+                _table = load_table()
+    return _table
+
+
+def free_texts(items: dict, table: dict) -> list[str]:
+    """Answer items with no stored vector (custom text, unknown phrases); these need the model."""
+    return list(dict.fromkeys(t for field_items in items.values() for t in field_items if t not in table))
+
+
+def compose(items: dict, table: dict, free_vectors: dict) -> list:
+    """Field vectors as the mean of their item vectors (stored options plus encoded free text)."""
+    return [
+        np.mean([table[t] if t in table else free_vectors[t] for t in field_items], axis=0)
+        for field_items in items.values()
+    ]
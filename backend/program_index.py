@@ -0,0 +1,564 @@
+import json
+import os
+import re
+import time
+from collections import Counter
+from datetime import datetime
+from types import MappingProxyType
+
+import numpy as np
+
+from ann_index import CentroidRouter, build_category_router, build_ivf
+from embedding import canonical_model_name
+
+
+# 🧩 SUBJECT MAPPING (for SHS and variants)
+SUBJECT_MAPPING = {
+    "general mathematics": "mathematics",
+    "math": "mathematics",
+    "pre-calculus": "mathematics",
+    "basic calculus": "mathematics",
+    "probability and statistics": "mathematics",
+    "stat": "mathematics",
+    "probability": "mathematics",
+
+    "earth science": "science",
+    "physical science": "science",
+    "biology": "science",
+    "chemistry": "science",
+    "physics": "science",
+    "science": "science",
+
+    "oral communication": "english",
+    "reading and writing": "english",
+    "english for academic and professional purposes": "english",
+    "english": "english",
+
+    "komunikasyon at pananaliksik": "filipino",
+    "pagbasa at pagsusuri": "filipino",
+    "filipino sa piling larangan": "filipino",
+    "filipino": "filipino",
+
+    "personal development": "social studies",
+    "understanding culture society and politics": "social studies",
+    "ucsp": "social studies",
+    "world religions": "social studies",
+    "philosophy": "social studies",
+    "social studies": "social studies",
+}
+
+
+def normalize_subject_name(name: str) -> str:
+    """Normalize subject name to lowercase and mapped equivalent."""
+    s = name.strip().lower()
+    return SUBJECT_MAPPING.get(s, s)
+
+
+def canonical_school_key(name) -> str:
+    """Canonical form of a school name used as the rankings join key."""
+    key = str(name or "").lower().replace("–", "-").replace("—", "-")
+    return re.sub(r"\s+", " ", key).strip()
+
+
+def build_rankings_join(rankings_data: dict) -> dict:
+    """(category, canonical school key or school_id) -> rating, first entry wins."""
+    join = {}
+    for category, ranked_list in rankings_data.items():
+        for school in ranked_list:
+            join.setdefault((category, canonical_school_key(school.get("school"))), school["rating"])
+            if school.get("school_id"):
+                join.setdefault((category, school["school_id"]), school["rating"])
+    return join
+
+
+TEXT_FIELDS = ("school", "name", "category", "school_type", "location")
+UNKNOWN_TUITION = (None, "", "N/A")
+STORAGE_MODES = ("float32", "float16", "int8")
+BUNDLE_FORMAT = 1
+BUNDLE_SCALARS = ("version", "embedding_model", "dim", "quarantined_count", "retrieval", "n_probe", "storage",
+                  "rescore_candidates", "pca_explained_variance", "build_seconds")
+SCORE_CHUNK_ROWS = 8192  # compact rows are widened to float32 this many at a time
+
+
+def validate_program(doc: dict, dim: int, embedding_model: str = None) -> list[dict]:
+    """Problems found in one program document.
+
+    Each problem is {"field", "reason", "action"}; "quarantined" problems keep the
+    document out of the index, "kept" ones are only reported.
+    """
+    problems = []
+    if embedding_model:
+        doc_model = canonical_model_name(doc.get("embedding_model"))
+        if doc_model != embedding_model:
+            problems.append({"field": "embedding_model",
+                             "reason": f"embedded with {doc_model}, index serves {embedding_model}",
+                             "action": "quarantined"})
+            return problems
+
+    vector = doc.get("vector")
+    if not isinstance(vector, list) or not vector:
+        problems.append({"field": "vector", "reason": "missing or not a list", "action": "quarantined"})
+    elif len(vector) != dim:
+        problems.append({"field": "vector", "reason": f"has {len(vector)} values, expected {dim}",
+                         "action": "quarantined"})
+    elif np.asarray(vector).dtype.kind not in "if" or not np.isfinite(vector).all():
+        problems.append({"field": "vector", "reason": "contains non-numeric or non-finite values",
+                         "action": "quarantined"})
+
+    for field in TEXT_FIELDS:
+        value = doc.get(field)
+        if value is not None and not isinstance(value, str):
+            problems.append({"field": field, "reason": f"expected text, got {type(value).__name__}",
+                             "action": "quarantined"})
+
+    tuition = doc.get("tuition_per_semester")
+    if not isinstance(tuition, (int, float)) and tuition not in UNKNOWN_TUITION:
+        problems.append({"field": "tuition_per_semester", "reason": f"not a number ({tuition!r}); treated as unknown",
+                         "action": "kept"})
+    return problems
+
+
+class ProgramIndex:
+    """Immutable scoring snapshot built once from the program_vectors corpus.
+
+    All program embeddings live in one contiguous matrix whose rows are
+    L2-normalized up front (float32, or compact float16 / int8), so cosine
+    similarity against a query becomes a single matrix-vector product. Once built, attributes cannot be rebound
+    and every array is read-only, so a snapshot can be shared by concurrent
+    requests and replaced wholesale by publishing a new one.
+    """
+
+    def __init__(self, programs: list[dict], rankings_data: dict = None, grade_profiles: list[dict] = None,
+                 version: int = 0, embedding_model: str = None, retrieval: str = "exact",
+                 ivf_lists: int = 0, ivf_probes: int = 8, ann_min_programs: int = 5000,
+                 category_probes: int = 2, storage: str = "float32", rescore_candidates: int = 0,
+                 pca_dimensions: int = 0):
+        start = time.perf_counter()
+        self.version = version
+
+        # Vectors from different models never share an index: with a model given,
+        # documents tagged (or, untagged, assumed) to come from another one are quarantined
+        self.embedding_model = canonical_model_name(embedding_model) if embedding_model else None
+        lengths = Counter(
+            len(p["vector"]) for p in programs
+            if isinstance(p.get("vector"), list) and p["vector"]
+            and (not self.embedding_model or canonical_model_name(p.get("embedding_model")) == self.embedding_model)
+        )
+        self.dim = lengths.most_common(1)[0][0] if lengths else 0
+
+        # Validate once here so the request path can assume clean rows
+        clean, report = [], []
+        for p in programs:
+            problems = validate_program(p, self.dim, self.embedding_model)
+            for problem in problems:
+                report.append({"doc_id": str(p.get("_id", "")), "program": p.get("name"),
+                               "school": p.get("school"), **problem})
+            if not any(problem["action"] == "quarantined" for problem in problems):
+                clean.append(p)
+        # Vectors live only in the matrix below; Python float lists cost ~8x more per value
+        self.programs = tuple({k: v for k, v in p.items() if k != "vector"} for p in clean)
+        self.quarantine = tuple(report)
+        self.quarantined_count = len(programs) - len(self.programs)
+        if report:
+            print(f"⚠️ Corpus validation: {self.quarantined_count} program(s) quarantined, "
+                  f"{len(report)} problem(s) reported (see /admin/corpus/quarantine)")
+
+        matrix = np.array([p["vector"] for p in clean], dtype=np.float32).reshape(len(clean), self.dim)
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        self.matrix = np.ascontiguousarray(matrix / norms, dtype=np.float32)
+        self._build_projection(pca_dimensions)
+        self._build_router(retrieval, ivf_lists, ivf_probes, ann_min_programs, category_probes)
+        self._build_storage(storage, rescore_candidates)
+
+        self.rankings_data = MappingProxyType(
+            {category: tuple(ranked_list) for category, ranked_list in (rankings_data or {}).items()}
+        )
+        self._build_school_ratings(self.rankings_data)
+        self._build_grade_profiles(grade_profiles or [])
+        self._build_filter_columns()
+
+        self.built_at = datetime.utcnow()
+        self.build_seconds = round(time.perf_counter() - start, 3)
+        self.bundle_path = None
+        self._freeze()
+
+    def save_bundle(self, path: str):
+        """Write this snapshot as a serving bundle: one .npy per array plus index.json metadata."""
+        os.makedirs(path)
+        arrays = {name: value for name, value in vars(self).items() if isinstance(value, np.ndarray)}
+        if self.router is not None:
+            arrays.update({"router_centroids": self.router.centroids, "router_rows": self.router.rows,
+                           "router_offsets": self.router.offsets})
+        for name, array in arrays.items():
+            np.save(os.path.join(path, f"{name}.npy"), array, allow_pickle=False)
+
+        meta = {
+            "format": BUNDLE_FORMAT,
+            **{name: getattr(self, name) for name in BUNDLE_SCALARS},
+            "built_at": self.built_at.isoformat(),
+            "arrays": sorted(arrays),
+            "programs": self.programs,
+            "quarantine": self.quarantine,
+            "rankings_data": dict(self.rankings_data),
+            "rankings_join": [[category, key, rating] for (category, key), rating in self.rankings_join.items()],
+            "fuzzy_joined_schools": self.fuzzy_joined_schools,
+            "unjoined_schools": self.unjoined_schools,
+            "grade_subjects": dict(self.grade_subjects),
+            "school_type_lookup": dict(self.school_type_lookup),
+            "location_values": self.location_values,
+            "router_names": self.router.names if self.router is not None else None,
+        }
+        with open(os.path.join(path, "index.json"), "w", encoding="utf-8") as f:
+            json.dump(meta, f, default=str)  # ObjectId / datetime fields become strings
+
+    @classmethod
+    def from_bundle(cls, path: str) -> "ProgramIndex":
+        """Snapshot backed by a serving bundle; arrays are memory-mapped read-only, not copied."""
+        with open(os.path.join(path, "index.json"), encoding="utf-8") as f:
+            meta = json.load(f)
+        if meta.get("format") != BUNDLE_FORMAT:
+            raise ValueError(f"unsupported bundle format {meta.get('format')!r} in {path}")
+
+        index = cls.__new__(cls)
+        arrays = {name: np.load(os.path.join(path, f"{name}.npy"), mmap_mode="r") for name in meta["arrays"]}
+        for name in BUNDLE_SCALARS:
+            setattr(index, name, meta[name])
+        for name in ("matrix_scales", "exact_matrix", "projection", "projection_mean"):
+            setattr(index, name, None)
+        for name, array in arrays.items():
+            if not name.startswith("router_"):
+                setattr(index, name, array)
+
+        index.programs = tuple(meta["programs"])
+        index.quarantine = tuple(meta["quarantine"])
+        index.rankings_data = MappingProxyType({c: tuple(ranked) for c, ranked in meta["rankings_data"].items()})
+        index.rankings_join = MappingProxyType({(c, key): rating for c, key, rating in meta["rankings_join"]})
+        index.fuzzy_joined_schools = tuple(meta["fuzzy_joined_schools"])
+        index.unjoined_schools = tuple(meta["unjoined_schools"])
+        index.grade_subjects = MappingProxyType(meta["grade_subjects"])
+        index.school_type_lookup = MappingProxyType(meta["school_type_lookup"])
+        index.location_values = tuple(meta["location_values"])
+        index.router = None
+        if "router_centroids" in arrays:
+            names = tuple(meta["router_names"]) if meta["router_names"] is not None else None
+            index.router = CentroidRouter.from_arrays(arrays["router_centroids"], arrays["router_rows"],
+                                                      arrays["router_offsets"], names)
+        index.built_at = datetime.fromisoformat(meta["built_at"])
+        index.bundle_path = path
+        index._freeze()
+        return index
+
+    def _freeze(self):
+        for value in vars(self).values():
+            if isinstance(value, np.ndarray):
+                value.flags.writeable = False
+        if self.router is not None:
+            self.router.freeze()
+        self._frozen = True
+
+    def __setattr__(self, name, value):
+        if getattr(self, "_frozen", False):
+            raise AttributeError("ProgramIndex snapshots are immutable; build a new one instead")
+        super().__setattr__(name, value)
+
+    def _build_projection(self, pca_dimensions: int):
+        """Optionally replace the matrix with its PCA projection (centred, not re-normalized).
+
+        For unit vectors v and q, v.q = mean.q + (v - mean).q, and the second term
+        is approximated in the top principal components. Scores therefore stay
+        on the cosine scale the THRESHOLD is tuned for.
+        """
+        self.projection = None
+        self.projection_mean = None
+        self.pca_explained_variance = None
+        if not pca_dimensions or pca_dimensions >= self.dim or len(self) < 2:
+            return
+        mean, components, explained = fit_pca(self.matrix, pca_dimensions)
+        self.matrix = np.ascontiguousarray((self.matrix - mean) @ components, dtype=np.float32)
+        self.projection = components
+        self.projection_mean = mean
+        self.pca_explained_variance = round(explained, 4)
+        print(f"📉 PCA projection {self.dim} -> {pca_dimensions} dims "
+              f"({100 * explained:.1f}% of variance kept)")
+
+    def serving_query(self, query_vector):
+        """Normalized query in the matrix's space, plus the score offset that space drops."""
+        query = np.asarray(query_vector, dtype=np.float32).reshape(-1)
+        norm = np.linalg.norm(query)
+        if norm == 0:
+            return None, 0.0
+        query = query / norm
+        if self.projection is None:
+            return query, 0.0
+        return query @ self.projection, float(self.projection_mean @ query)
+
+    def _build_router(self, retrieval: str, ivf_lists: int, ivf_probes: int, ann_min_programs: int,
+                      category_probes: int):
+        """Optional approximate candidate selection (IVF lists or category centroids)."""
+        self.retrieval = "exact"
+        self.router = None
+        self.n_probe = ivf_probes
+        if retrieval == "category":
+            # Two-stage: score category centroids, then only programs of the closest categories
+            self.router = build_category_router(self.matrix, [p.get("category", "") for p in self.programs])
+            self.retrieval = "category"
+            self.n_probe = category_probes
+            print(f"🗂️ Category routing: {len(self.router)} categories over {len(self)} programs, "
+                  f"scoring the closest {category_probes}")
+        elif retrieval == "ivf":
+            if len(self) < max(ann_min_programs, 1):
+                print(f"ℹ️ IVF index skipped: {len(self)} programs is below ANN_MIN_PROGRAMS={ann_min_programs}")
+            else:
+                self.router = build_ivf(self.matrix, ivf_lists)
+                self.retrieval = "ivf"
+                print(f"🗂️ IVF index: {len(self.router)} lists over {len(self)} programs, probing {ivf_probes}")
+        elif retrieval != "exact":
+            print(f"⚠️ Unknown retrieval mode {retrieval!r}; using exact scoring")
+
+    def candidate_rows(self, query_vector, mask: np.ndarray, min_rows: int = 0, n_probe: int = None) -> np.ndarray:
+        """Sorted rows that pass `mask` and are worth scoring for this query.
+
+        Exact retrieval returns every row in the mask. With a router, only rows
+        from the closest groups are returned (at least `min_rows` of them when
+        the mask allows).
+        """
+        query, _ = self.serving_query(query_vector)
+        if self.router is None or query is None:
+            return np.flatnonzero(mask)
+        return self.router.route(query, n_probe or self.n_probe, mask, min_rows)
+
+    def _build_storage(self, storage: str, rescore_candidates: int):
+        """Keep the serving matrix as float32, float16 or int8 with one scale per row.
+
+        With rescore_candidates, the float32 matrix is kept as well and the best
+        compact-scored candidates of each query are rescored exactly.
+        """
+        if storage not in STORAGE_MODES:
+            print(f"⚠️ Unknown storage mode {storage!r}; using float32")
+            storage = "float32"
+        self.storage = storage
+        self.rescore_candidates = rescore_candidates if storage != "float32" else 0
+        self.exact_matrix = self.matrix if self.rescore_candidates else None
+        self.matrix_scales = None
+        if storage == "float16":
+            self.matrix = self.matrix.astype(np.float16)
+        elif storage == "int8":
+            scales = np.abs(self.matrix).max(axis=1) / 127.0
+            scales[scales == 0] = 1.0
+            self.matrix = np.round(self.matrix / scales[:, None]).astype(np.int8)
+            self.matrix_scales = scales.astype(np.float32)
+
+    def matrix_bytes(self) -> int:
+        """Memory held by the serving matrix, its scales, the rescoring copy and the projection."""
+        arrays = (self.matrix, self.matrix_scales, self.exact_matrix, self.projection, self.projection_mean)
+        return sum(a.nbytes for a in arrays if a is not None)
+
+    def vectors(self, rows) -> np.ndarray:
+        """float32 rows in the serving space (dequantized when compact, reduced when PCA-projected)."""
+        if self.exact_matrix is not None:
+            return self.exact_matrix[rows]
+        vectors = self.matrix[rows].astype(np.float32)
+        if self.matrix_scales is not None:
+            vectors *= self.matrix_scales[rows][..., None]
+        return vectors
+
+    def _build_school_ratings(self, rankings_data: dict):
+        """Resolve every program's school rating once through the rankings join."""
+        join = build_rankings_join(rankings_data)
+        self.rankings_join = MappingProxyType(join)
+        ratings = np.zeros(len(self.programs), dtype=np.float64)
+        fuzzy_joined, unjoined = [], []
+
+        for row, entry in enumerate(self.programs):
+            category = entry.get("category", "")
+            if category not in rankings_data:
+                continue  # no rankings published for this category
+
+            rating = join.get((category, entry.get("school_id")))
+            if rating is None:
+                rating = join.get((category, canonical_school_key(entry.get("school"))))
+            if rating is None:
+                # Legacy rule: ranked school name contains the program's school name. An empty
+                # name no longer matches ("" is in every string, which used to hand such
+                # programs the first ranked school's rating); they are reported as unjoined.
+                school_name = canonical_school_key(entry.get("school"))
+                for school in rankings_data[category]:
+                    if school_name and school_name in canonical_school_key(school.get("school")):
+                        rating = school["rating"]
+                        fuzzy_joined.append({"school": entry.get("school"), "category": category,
+                                             "matched": school.get("school")})
+                        break
+            if rating is None:
+                unjoined.append({"school": entry.get("school"), "category": category,
+                                 "program": entry.get("name")})
+                continue
+            ratings[row] = rating or 0
+
+        self.school_ratings = ratings
+        self.fuzzy_joined_schools = tuple(fuzzy_joined)
+        self.unjoined_schools = tuple(unjoined)
+
+        if self.fuzzy_joined_schools or self.unjoined_schools:
+            print(f"🏫 Rankings join: {len(self.fuzzy_joined_schools)} program(s) matched by partial school name, "
+                  f"{len(self.unjoined_schools)} program(s) in ranked categories without a rating")
+            for school, category in sorted({(u["school"], u["category"]) for u in self.unjoined_schools}):
+                print(f"   - unranked: {school} ({category})")
+
+    def _build_filter_columns(self):
+        """Columnar structures behind the school_type / location / budget filters."""
+        school_type_codes = {}
+        self.school_type_codes = np.array(
+            [school_type_codes.setdefault(str(p.get("school_type") or "").lower(), len(school_type_codes))
+             for p in self.programs],
+            dtype=np.intp,
+        )
+        self.school_type_lookup = MappingProxyType(school_type_codes)
+
+        # Each distinct location string is stored once; programs point at it by code
+        location_codes = {}
+        self.location_codes = np.array(
+            [location_codes.setdefault(str(p.get("location") or "").lower(), len(location_codes))
+             for p in self.programs],
+            dtype=np.intp,
+        )
+        self.location_values = tuple(location_codes)
+
+        tuition = [p.get("tuition_per_semester") for p in self.programs]
+        # Non-numeric tuition (None, "N/A") is unknown: NaN never exceeds a budget
+        self.tuition = np.array([t if isinstance(t, (int, float)) else np.nan for t in tuition], dtype=np.float64)
+
+    def filter_mask(self, school_type: str = None, locations: list[str] = None,
+                    max_budget: float = None) -> np.ndarray:
+        """Boolean mask of the programs that pass all request filters."""
+        mask = np.ones(len(self), dtype=bool)
+
+        if school_type and school_type.lower() != "any":
+            code = self.school_type_lookup.get(school_type.lower(), -1)
+            mask &= self.school_type_codes == code
+
+        if locations:
+            # Substring match against the few distinct locations, then a membership test per row
+            wanted = [loc.lower() for loc in locations]
+            matched = [code for code, value in enumerate(self.location_values)
+                       if any(loc in value for loc in wanted)]
+            mask &= np.isin(self.location_codes, matched)
+
+        if max_budget is not None:
+            # As before: only a known tuition above the budget excludes a program (NaN compares False)
+            mask &= ~(self.tuition > float(max_budget))
+
+        return mask
+
+    def _build_grade_profiles(self, grade_profiles: list[dict]):
+        """Compile grade profiles into a dense category x subject matrix with a presence mask."""
+        category_ids = {}
+        subjects = {}
+        profiles = []
+        for g in grade_profiles:
+            key = str(g.get("category", "")).lower()
+            if key in category_ids:
+                continue  # first profile for a category wins
+            profile = g.get("profile") or g.get("subjects") or g.get("grade_weights") or {}
+            normalized = {normalize_subject_name(k): float(v) for k, v in profile.items()}
+            category_ids[key] = len(profiles)
+            profiles.append(normalized)
+            for subject in normalized:
+                subjects.setdefault(subject, len(subjects))
+
+        self.grade_subjects = MappingProxyType(subjects)
+        grade_matrix = np.zeros((len(profiles), len(subjects)), dtype=np.float64)
+        grade_mask = np.zeros((len(profiles), len(subjects)), dtype=bool)
+        for cid, profile in enumerate(profiles):
+            for subject, weight in profile.items():
+                grade_matrix[cid, subjects[subject]] = weight
+                grade_mask[cid, subjects[subject]] = True
+        self.grade_matrix = grade_matrix
+        self.grade_mask = grade_mask
+
+        # Programs whose category has no profile point at the trailing zero slot (-1)
+        self.category_ids = np.array(
+            [category_ids.get(str(p.get("category", "")).lower(), -1) for p in self.programs], dtype=np.intp
+        )
+
+    def grade_similarities(self, user_grades: dict, rows: np.ndarray = None) -> np.ndarray:
+        """Grade similarity of the given rows (default: all), computed once per category.
+
+        For each category the cosine is taken over the subjects present in both
+        the user's grades and the category profile; no overlap scores 0.
+        """
+        user = np.zeros(len(self.grade_subjects), dtype=np.float64)
+        present = np.zeros(len(self.grade_subjects), dtype=bool)
+        for subject, grade in user_grades.items():
+            col = self.grade_subjects.get(normalize_subject_name(subject))
+            if col is None:
+                continue
+            try:
+                user[col] = float(grade)
+            except (TypeError, ValueError):
+                continue
+            present[col] = True
+
+        common = self.grade_mask & present
+        profile = np.where(common, self.grade_matrix, 0.0)
+        user_masked = np.where(common, user, 0.0)
+        denom = np.linalg.norm(profile, axis=1) * np.linalg.norm(user_masked, axis=1)
+        dot = profile @ user
+        per_category = np.divide(dot, denom, out=np.zeros_like(dot), where=denom > 0)
+        category_ids = self.category_ids if rows is None else self.category_ids[rows]
+        return np.append(per_category, 0.0)[category_ids]
+
+    def __len__(self):
+        return len(self.programs)
+
+    def interest_scores(self, query_vector, rows: np.ndarray = None) -> np.ndarray:
+        """Cosine similarity of the given sorted rows (default: all) against the query."""
+        query, offset = self.serving_query(query_vector)
+        count = len(self) if rows is None else len(rows)
+        if query is None or count == 0:
+            return np.zeros(count, dtype=np.float32)
+        all_rows = rows is None or count == len(self)
+        matrix = self.matrix if all_rows else self.matrix[rows]
+        if self.storage == "float32":
+            return matrix @ query + offset if self.projection is not None else matrix @ query
+
+        scores = np.empty(count, dtype=np.float32)
+        for start in range(0, count, SCORE_CHUNK_ROWS):
+            scores[start:start + SCORE_CHUNK_ROWS] = matrix[start:start + SCORE_CHUNK_ROWS].astype(np.float32) @ query
+        if self.matrix_scales is not None:
+            scores *= self.matrix_scales if all_rows else self.matrix_scales[rows]
+        if self.rescore_candidates:
+            top = select_top_k(scores, self.rescore_candidates)
+            scores[top] = self.exact_matrix[top if all_rows else rows[top]] @ query
+        return scores + offset
+
+
+def fit_pca(matrix: np.ndarray, n_components: int):
+    """Mean, top principal components (dim x n_components) and explained variance share."""
+    mean = matrix.mean(axis=0)
+    centered = (matrix - mean).astype(np.float64)
+    eigenvalues, eigenvectors = np.linalg.eigh(centered.T @ centered)
+    top = np.argsort(eigenvalues)[::-1][:n_components]
+    explained = float(eigenvalues[top].sum() / max(eigenvalues.sum(), 1e-12))
+    return mean.astype(np.float32), np.ascontiguousarray(eigenvectors[:, top], dtype=np.float32), explained
+
+
+def select_top_k(scores: np.ndarray, k: int) -> np.ndarray:
+    """Positions of the k highest scores, best first.
+
+    Uses a partial selection (O(n)) and only sorts the k survivors. Ties are
+    broken by position, so the order matches a stable descending sort.
+    """
+    scores = np.asarray(scores)
+    n = len(scores)
+    if k <= 0 or n == 0:
+        return np.empty(0, dtype=np.intp)
+    if k < n:
+        kth_value = scores[np.argpartition(-scores, k - 1)[k - 1]]
+        above = np.flatnonzero(scores > kth_value)
+        tied = np.flatnonzero(scores == kth_value)[: k - len(above)]
+        candidates = np.concatenate([above, tied])
+    else:
+        candidates = np.arange(n)
+    order = np.lexsort((candidates, -scores[candidates]))
+    return candidates[order]
@@ -0,0 +1,101 @@
+import asyncio
+import os
+import threading
+import time
+
+import corpus
+import embedding
+import recommendation
+
+# CONFIG
+WARMUP_RETRY_SECONDS = float(os.getenv("WARMUP_RETRY_SECONDS", "1"))  # first retry delay, doubled each time
+WARMUP_RETRY_MAX_SECONDS = float(os.getenv("WARMUP_RETRY_MAX_SECONDS", "30"))
+
+# Representative questionnaires: option-only, with custom text, with grades and filters
+WARMUP_REQUESTS = [
+    {"answers": {"academics": ["Mathematics", "ICT"], "fields": ["Information Technology"],
+                 "activities": ["Problem-solving"], "goals": ["Driving innovation"],
+                 "environment": ["Tech-driven workspace"]},
+     "user_grades": {"math": 90, "science": 88, "english": 85, "filipino": 87, "social": 86}},
+    {"answers": {"fields": ["Healthcare"], "goals": ["Improving lives"],
+                 "custom": {"activities": "taking care of patients and volunteering in clinics"}},
+     "school_type": "private", "locations": ["Angeles"], "max_budget": 50000},
+]
+
+_checks = {"model": False, "corpus_index": False, "rankings": False, "grade_profiles": False, "warmed": False}
+_details = {"attempts": 0, "last_error": None}
+
+
+def warmup(loop: asyncio.AbstractEventLoop = None) -> bool:
+    """Load and exercise everything /search needs so the first real request is not the slow one.
+
+    With the app's event loop, the warmup requests go through recommend_async (encoder
+    queue, embedding cache) exactly like real traffic; without one, through recommend().
+    """
+    start = time.perf_counter()
+    _details["attempts"] += 1
+    for name in _checks:
+        _checks[name] = False
+    try:
+        # Encoder: load it, then run a few batch sizes so tokenizer and kernel buffers are allocated
+        embedding.encode(embedding.PROBE_SENTENCES[:1], batch_size=1)
+        embedding.encode(embedding.PROBE_SENTENCES, batch_size=len(embedding.PROBE_SENTENCES))
+        _checks["model"] = True
+
+        index = corpus.get_index()
+        _details["corpus_version"] = index.version
+        _checks["corpus_index"] = len(index) > 0
+        _checks["rankings"] = len(index.rankings_data) > 0
+        _checks["grade_profiles"] = index.grade_matrix.shape[0] > 0
+
+        # Full encode + scoring path with the production code
+        for request in WARMUP_REQUESTS:
+            if loop is not None:
+                asyncio.run_coroutine_threadsafe(recommendation.recommend_async(**request), loop).result()
+            else:
+                recommendation.recommend(**request)
+        _checks["warmed"] = True
+    except Exception as e:
+        _details["last_error"] = f"{type(e).__name__}: {e}"
+        print(f"❌ Warmup attempt {_details['attempts']} failed, staying not-ready: {e}")
+    _details["warmup_seconds"] = round(time.perf_counter() - start, 3)
+    if is_ready():
+        print(f"🔥 Warmup done in {_details['warmup_seconds']}s, worker is ready")
+    else:
+        print(f"⚠️ Worker not ready after warmup: {[name for name, ok in _checks.items() if not ok]}")
+    return is_ready()
+
+
+def _warmup_until_ready(loop: asyncio.AbstractEventLoop = None):
+    delay = WARMUP_RETRY_SECONDS
+    while not warmup(loop):
+        if _checks["model"] and _checks["warmed"]:
+            # Everything ran but the corpus is incomplete; that only changes with a new corpus version
+            print(f"⏳ Waiting for a corpus version newer than v{_details['corpus_version']} before rechecking")
+            while corpus.get_index().version == _details["corpus_version"]:
+                time.sleep(corpus.CORPUS_POLL_SECONDS)
+            delay = WARMUP_RETRY_SECONDS
+            continue
+        # A sidecar still starting or a brief Mongo outage must not leave the worker at 503 for good
+        time.sleep(delay)
+        delay = min(delay * 2, WARMUP_RETRY_MAX_SECONDS)
+
+
+def start_warmup():
+    """Warm up in the background, retrying with backoff, so /ready can answer (503) while it runs.
+
+    Call it from the app's startup event so the warmup requests use its event loop.
+    """
+    try:
+        loop = asyncio.get_running_loop()
+    except RuntimeError:
+        loop = None
+    threading.Thread(target=_warmup_until_ready, args=(loop,), name="warmup", daemon=True).start()
+
+
+def is_ready() -> bool:
+    return all(_checks.values())
+
+
+def status() -> dict:
+    return {"ready": is_ready(), "checks": dict(_checks), **_details}
@@ -1,99 +1,136 @@
-from sklearn.metrics.pairwise import cosine_similarity
-from sentence_transformers import SentenceTransformer
 import numpy as np
-from collections import Counter
+from collections import Counter, deque
 
-from db import db  # shared DB connection
-
-# Load NLP model
-model = SentenceTransformer("all-mpnet-base-v2")
-
-# Load databases
-program_data = list(db["program_vectors"].find({}, {"_id": 0}))
-rankings_doc = db["school_rankings"].find_one({}, {"_id": 0})
-grade_profiles = list(db["grade_profiles"].find({}, {"_id": 0}))
-
-# Extract ranking data
-rankings_data = rankings_doc["programs"] if rankings_doc and "programs" in rankings_doc else {}
+import corpus
+import embedding
+import embedding_cache
+import encoder_queue
+import option_phrases
+from program_index import select_top_k
 
 # CONFIG
 THRESHOLD = 0.4
 CATEGORY_WEIGHT = 0.3
 GRADE_WEIGHT = 0.3  # weight of grade similarity in final score
+ANSWER_FIELDS = ["academics", "fields", "activities", "goals", "environment"]
+RESULT_CANDIDATES = 20  # programs needed to fill "results" + "weak_matches"
+NO_STRONG_MATCH_MESSAGE = "We couldn't find a strong match based on your interests and grades. Here are some alternatives."
 
+# Share of the corpus scored by recent queries (candidate retrieval + filters)
+_touched = deque(maxlen=1000)
 
-# 🧩 SUBJECT MAPPING (for SHS and variants)
-SUBJECT_MAPPING = {
-    "general mathematics": "mathematics",
-    "math": "mathematics",
-    "pre-calculus": "mathematics",
-    "basic calculus": "mathematics",
-    "probability and statistics": "mathematics",
-    "stat": "mathematics",
-    "probability": "mathematics",
 
-    "earth science": "science",
-    "physical science": "science",
-    "biology": "science",
-    "chemistry": "science",
-    "physics": "science",
-    "science": "science",
+def build_result_item(entry, interest_score, grade_score, final_score, school_rating):
+    """Full response payload for one selected program."""
+    return {
+        "school": entry.get("school"),
+        "program": entry.get("name"),
+        "description": entry.get("description"),
+        "similarity_score": float(interest_score),
+        "grade_similarity": float(grade_score),
+        "final_score": float(final_score),
+        "tuition_per_semester": entry.get("tuition_per_semester"),
+        "tuition_annual": entry.get("tuition_annual"),
+        "tuition_notes": entry.get("tuition_notes"),
+        "admission_requirements": entry.get("admission_requirements"),
+        "grade_requirements": entry.get("grade_requirements"),
+        "school_requirements": entry.get("school_requirements"),
+        "school_website": entry.get("school_website"),
+        "school_type": entry.get("school_type"),
+        "location": entry.get("location"),
+        "school_logo": entry.get("school_logo"),
+        "board_passing_rate": entry.get("board_passing_rate"),
+        "national_passing_rate": entry.get("national_passing_rate"),
+        "uni_rank": entry.get("uni_rank"),
+        "category": entry.get("category", ""),
+        "school_rank": float(school_rating),
+    }
 
-    "oral communication": "english",
-    "reading and writing": "english",
-    "english for academic and professional purposes": "english",
-    "english": "english",
 
-    "komunikasyon at pananaliksik": "filipino",
-    "pagbasa at pagsusuri": "filipino",
-    "filipino sa piling larangan": "filipino",
-    "filipino": "filipino",
+def answer_texts(answers: dict) -> dict:
+    """Questionnaire field -> text to embed (checkbox choices plus custom text), non-empty only."""
+    texts = {}
+    for key in ANSWER_FIELDS:
+        items = answers.get(key, [])
+        custom = answers.get("custom", {}).get(key, "")
+        merged = items + ([custom] if custom.strip() else [])
+        text = " ".join(merged)
+        if text.strip():
+            texts[key] = text
+    return texts
 
-    "personal development": "social studies",
-    "understanding culture society and politics": "social studies",
-    "ucsp": "social studies",
-    "world religions": "social studies",
-    "philosophy": "social studies",
-    "social studies": "social studies",
-}
 
+def answer_items(answers: dict) -> dict:
+    """Questionnaire field -> individual answers (checkbox choices plus custom text), non-empty only."""
+    items = {}
+    for key in ANSWER_FIELDS:
+        custom = answers.get("custom", {}).get(key, "")
+        merged = [t for t in answers.get(key, []) + [custom] if t.strip()]
+        if merged:
+            items[key] = merged
+    return items
+
+
+def encode_texts(texts: list[str]) -> list:
+    """Vectors from the default encoder; texts already in the embedding cache skip the model."""
+    if embedding_cache.cache is not None:
+        return embedding_cache.cache.encode(texts, embedding.encode)
+    return embedding.encode(texts, batch_size=len(texts))
 
-def normalize_subject_name(name: str) -> str:
-    """Normalize subject name to lowercase and mapped equivalent."""
-    s = name.strip().lower()
-    return SUBJECT_MAPPING.get(s, s)
 
+async def encode_texts_async(texts: list[str]) -> list:
+    """encode_texts() through the worker's micro-batching encoder queue."""
+    if embedding_cache.cache is not None:
+        return await embedding_cache.cache.encode_async(texts, encoder_queue.batcher.encode)
+    return await encoder_queue.batcher.encode(texts)
 
-def get_school_rating(school_name, category):
-    ranked_list = rankings_data.get(category, [])
-    for school in ranked_list:
-        if school_name.lower() in school["school"].lower():
-            return school["rating"]
-    return None
 
+def encode_answers(answers: dict, encoder=embedding) -> dict:
+    """Per-field answer vectors, all non-empty fields encoded in one batched forward pass."""
+    texts = answer_texts(answers)
+    if not texts:
+        return {}
+    if encoder is embedding:
+        encoded = encode_texts(list(texts.values()))
+    else:
+        encoded = encoder.encode(list(texts.values()), batch_size=len(texts))
+    return dict(zip(texts.keys(), encoded))
 
-def get_grade_profile(category):
-    """Fetch expected grade profile for a given category."""
-    for g in grade_profiles:
-        if g["category"].lower() == category.lower():
-            return g.get("profile") or g.get("subjects") or {}
-    return {}
 
+def fast_path_inputs(answers: dict) -> tuple:
+    """Answer items, the option-phrase table, and the free texts that still need the encoder."""
+    items = answer_items(answers)
+    table = option_phrases.get_table()
+    return items, table, option_phrases.free_texts(items, table)
 
-def compute_grade_similarity(user_grades, category_profile):
-    """Compare user grades vs. typical profile for a category."""
-    # Normalize subject names before comparison
-    normalized_user_grades = {normalize_subject_name(k): v for k, v in user_grades.items()}
-    normalized_profile = {normalize_subject_name(k): v for k, v in category_profile.items()}
 
-    subjects = list(set(normalized_user_grades.keys()) & set(normalized_profile.keys()))
-    if not subjects:
-        return 0.0
+def compose_answer_vectors(answers: dict) -> list:
+    """Fast-path field vectors from stored option-phrase embeddings; only free text is encoded."""
+    items, table, free = fast_path_inputs(answers)
+    free_vectors = dict(zip(free, encode_texts(free))) if free else {}
+    return option_phrases.compose(items, table, free_vectors)
 
-    user_vector = np.array([normalized_user_grades[s] for s in subjects])
-    profile_vector = np.array([normalized_profile[s] for s in subjects])
 
-    return cosine_similarity([user_vector], [profile_vector])[0][0]
+async def compose_answer_vectors_async(answers: dict) -> list:
+    """compose_answer_vectors() with free text sent through the worker's encoder queue."""
+    items, table, free = fast_path_inputs(answers)
+    free_vectors = dict(zip(free, await encode_texts_async(free))) if free else {}
+    return option_phrases.compose(items, table, free_vectors)
+
+
+def combine_field_vectors(vectors) -> np.ndarray:
+    """Mean of the non-zero field vectors, or None when there are none."""
+    valid_vectors = [v for v in vectors if np.linalg.norm(v) > 0]
+    if not valid_vectors:
+        return None
+    return np.mean(valid_vectors, axis=0)
+
+
+def build_query_vector(answers: dict, encoder=embedding):
+    """Mean of the per-field answer vectors, or None when nothing was answered."""
+    if option_phrases.OPTION_FAST_PATH and encoder is embedding:
+        return combine_field_vectors(compose_answer_vectors(answers))
+    return combine_field_vectors(encode_answers(answers, encoder).values())
 
 
 def recommend(answers: dict, user_grades: dict = None, school_type: str = None,
@@ -102,20 +139,43 @@ def recommend(answers: dict, user_grades: dict = None, school_type: str = None,
     print("\n📊 Starting Program Matching Breakdown")
 
     # Step 1: NLP Vectorization of answers
-    vectors = {}
-    for key in ["academics", "fields", "activities", "goals", "environment"]:
-        items = answers.get(key, [])
-        custom = answers.get("custom", {}).get(key, "")
-        merged = items + ([custom] if custom.strip() else [])
-        text = " ".join(merged)
-        if text.strip():
-            vec = model.encode(text)
-        else:
-            vec = np.zeros(model.get_sentence_embedding_dimension())
-        vectors[key] = vec
+    combined_vector = build_query_vector(answers)
+    return rank_programs(combined_vector, user_grades, school_type, locations, max_budget)
 
-    valid_vectors = [v for v in vectors.values() if np.linalg.norm(v) > 0]
-    if not valid_vectors:
+
+async def recommend_async(answers: dict, user_grades: dict = None, school_type: str = None,
+                          locations: list[str] = None, max_budget: float = None):
+    """recommend() for the async API: answer texts go through the worker's micro-batching encoder queue."""
+    if not encoder_queue.ENCODER_BATCHING:
+        return recommend(answers, user_grades, school_type, locations, max_budget)
+
+    print("\n📊 Starting Program Matching Breakdown")
+
+    # Step 1: NLP Vectorization of answers, batched with other in-flight requests
+    if option_phrases.OPTION_FAST_PATH:
+        vectors = await compose_answer_vectors_async(answers)
+    else:
+        texts = list(answer_texts(answers).values())
+        vectors = await encode_texts_async(texts) if texts else []
+    return rank_programs(combine_field_vectors(vectors), user_grades, school_type, locations, max_budget)
+
+
+def retrieval_metrics() -> dict:
+    """How much of the corpus recent queries actually scored."""
+    touched = np.array(_touched or [0.0])
+    return {
+        "retrieval": corpus.get_index().retrieval,
+        "queries": len(_touched),
+        "corpus_touched_mean": round(float(touched.mean()), 4),
+        "corpus_touched_p50": round(float(np.percentile(touched, 50)), 4),
+        "corpus_touched_max": round(float(touched.max()), 4),
+    }
+
+
+def rank_programs(combined_vector, user_grades: dict = None, school_type: str = None,
+                  locations: list[str] = None, max_budget: float = None):
+    """Score, filter and select programs for an already-encoded questionnaire."""
+    if combined_vector is None:
         return {
             "type": "fallback",
             "message": "No valid input provided. Please answer at least one question.",
@@ -123,103 +183,79 @@ def recommend(answers: dict, user_grades: dict = None, school_type: str = None,
             "weak_matches": []
         }
 
-    combined_vector = np.mean(valid_vectors, axis=0).reshape(1, -1)
-
-    # Step 2: Evaluate all programs
-    candidate_programs = []
-    for entry in program_data:
-        try:
-            entry_type = entry.get("school_type", "").lower()
-            if school_type and school_type.lower() != "any" and entry_type != school_type.lower():
-                continue
-
-            if locations:
-                entry_location = entry.get("location", "").lower()
-                if all(loc.lower() not in entry_location for loc in locations):
-                    continue
-
-            if max_budget is not None:
-                tuition = entry.get("tuition_per_semester")
-                if tuition is not None and isinstance(tuition, (int, float)) and tuition > max_budget:
-                    continue
-
-            # Interest similarity
-            program_vector = np.array(entry["vector"]).reshape(1, -1)
-            interest_score = cosine_similarity(program_vector, combined_vector)[0][0]
-
-            # Grade similarity
-            category = entry.get("category", "")
-            profile = get_grade_profile(category)
-            grade_score = compute_grade_similarity(user_grades or {}, profile) if user_grades else 0.0
-
-            # School rating
-            school_rating = get_school_rating(entry.get("school", ""), category) or 0
-
-            # Combine all scores
-            final_score = (0.7 * interest_score) + (GRADE_WEIGHT * grade_score) + (CATEGORY_WEIGHT * school_rating)
-
-            result_item = {
-                "school": entry.get("school"),
-                "program": entry.get("name"),
-                "description": entry.get("description"),
-                "similarity_score": interest_score,
-                "grade_similarity": grade_score,
-                "final_score": final_score,
-                "tuition_per_semester": entry.get("tuition_per_semester"),
-                "tuition_annual": entry.get("tuition_annual"),
-                "tuition_notes": entry.get("tuition_notes"),
-                "admission_requirements": entry.get("admission_requirements"),
-                "grade_requirements": entry.get("grade_requirements"),
-                "school_requirements": entry.get("school_requirements"),
-                "school_website": entry.get("school_website"),
-                "school_type": entry.get("school_type"),
-                "location": entry.get("location"),
-                "school_logo": entry.get("school_logo"),
-                "board_passing_rate": entry.get("board_passing_rate"),
-                "national_passing_rate": entry.get("national_passing_rate"),
-                "uni_rank": entry.get("uni_rank"),
-                "category": category,
-                "school_rank": school_rating,
-            }
-
-            candidate_programs.append(result_item)
-
-        except Exception as e:
-            print(f"⚠️ Skipping invalid entry: {e}")
-            continue
+    program_index = corpus.get_index()
+    if len(program_index) == 0:
+        # Empty corpus, or every document quarantined: nothing to score
+        return {
+            "type": "fallback",
+            "message": NO_STRONG_MATCH_MESSAGE,
+            "results": [],
+            "weak_matches": [],
+            "matched_category": None,
+            "top_schools_for_category": []
+        }
+    if len(combined_vector) != program_index.dim:
+        raise RuntimeError(
+            f"Query embedding has {len(combined_vector)} dimensions but the program index holds "
+            f"{program_index.dim}-dim vectors from {program_index.embedding_model}; "
+            "re-embed program_vectors with the configured model (python -m tools.reembed_programs)"
+        )
+
+    # Step 2: Filter with precomputed columns, then score only the surviving (and, with an ANN
+    # index, nearby) rows; enough candidates are kept to fill both result lists
+    mask = program_index.filter_mask(school_type, locations, max_budget)
+    rows = program_index.candidate_rows(combined_vector, mask, min_rows=RESULT_CANDIDATES)
+    _touched.append(len(rows) / max(len(program_index), 1))
+    print(f"🔎 Scored {len(rows)} of {len(program_index)} programs ({program_index.retrieval} retrieval)")
+    similarity = program_index.interest_scores(combined_vector, rows).astype(np.float64)
+
+    # Grade similarity: one pass over all categories, broadcast to programs by category id
+    if user_grades:
+        grade_scores = program_index.grade_similarities(user_grades, rows)
+    else:
+        grade_scores = np.zeros(len(rows), dtype=np.float64)
+    school_ratings = program_index.school_ratings[rows]
+
+    # Combine all scores
+    final_scores = (0.7 * similarity) + (GRADE_WEIGHT * grade_scores) + (CATEGORY_WEIGHT * school_ratings)
 
     # Step 3: Separate matches
-    strong_matches = [p for p in candidate_programs if p["similarity_score"] >= THRESHOLD]
-    weak_matches = [p for p in candidate_programs if p["similarity_score"] < THRESHOLD]
+    strong = np.flatnonzero(similarity >= THRESHOLD)
+    weak = np.flatnonzero(similarity < THRESHOLD)
 
     # Step 4: Identify top category
-    categories = [p["category"] for p in strong_matches if p["category"]]
+    categories = [program_index.programs[rows[i]].get("category", "") for i in strong]
+    categories = [c for c in categories if c]
     top_category = Counter(categories).most_common(1)[0][0] if categories else None
 
-    # Step 5: Sort by combined score
-    final_strong = sorted(strong_matches, key=lambda x: x["final_score"], reverse=True)
-    final_weak = sorted(weak_matches, key=lambda x: x["final_score"], reverse=True)
+    # Step 5: Select only the top-k by combined score, then build result dicts for those
+    def materialize(positions, k):
+        selected = positions[select_top_k(final_scores[positions], k)]
+        return [
+            build_result_item(program_index.programs[rows[i]], similarity[i], grade_scores[i],
+                              final_scores[i], school_ratings[i])
+            for i in selected
+        ]
 
     # Step 6: Top ranked schools
-    top_ranked_schools = rankings_data.get(top_category, [])[:5] if top_category else []
+    top_ranked_schools = list(program_index.rankings_data.get(top_category, ())[:5]) if top_category else []
 
     # Step 7: Fallback
-    if not final_strong:
-        fallback_results = final_weak[:6]
-        fallback_weak = final_weak[6:12] if len(final_weak) > 6 else []
+    if len(strong) == 0:
+        fallback = materialize(weak, 12)
         return {
             "type": "fallback",
-            "message": "We couldn't find a strong match based on your interests and grades. Here are some alternatives.",
-            "results": fallback_results,
-            "weak_matches": fallback_weak,
+            "message": NO_STRONG_MATCH_MESSAGE,
+            "results": fallback[:6],
+            "weak_matches": fallback[6:12],
             "matched_category": top_category,
             "top_schools_for_category": top_ranked_schools
         }
 
     return {
         "type": "exact",
-        "results": final_strong[:10],
-        "weak_matches": final_weak[:10],
+        "results": materialize(strong, 10),
+        "weak_matches": materialize(weak, 10),
         "matched_category": top_category,
         "top_schools_for_category": top_ranked_schools
     }
@@ -92,3 +92,16 @@ try:
     print(f"✅ SUCCESS: Inserted {len(result.inserted_ids)} documents into '{collection_name}'.")
 except Exception as e:
     print(f"❌ MongoDB Error: {e}")
+    exit()
+
+# ---------------------------------------
+# TELL API WORKERS THE CORPUS CHANGED
+# (same document as corpus.bump_corpus_version; the old fingerprint no longer describes the data)
+# ---------------------------------------
+if collection_name in ("program_vectors", "school_rankings", "grade_profiles"):
+    db["corpus_versions"].update_one(
+        {"_id": "program_index"},
+        {"$inc": {"version": 1}, "$set": {"updated_at": datetime.utcnow()}, "$unset": {"fingerprint": ""}},
+        upsert=True,
+    )
+    print("🔄 Bumped the corpus version; workers will rebuild their program index")
@@ -0,0 +1,88 @@
+import os
+import sys
+import types
+
+import numpy as np
+import pytest
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+# The tests never talk to MongoDB: modules importing the shared connection get an empty stand-in
+if "db" not in sys.modules:
+    _db = types.ModuleType("db")
+    _db.db = {}
+    sys.modules["db"] = _db
+
+MODEL = "sentence-transformers/all-mpnet-base-v2"
+CATEGORIES = ["Business", "Engineering", "Healthcare", "Education", "Information Technology"]
+SCHOOLS = ["Holy Angel University", "Angeles University Foundation", "Pampanga State University",
+           "Mabalacat City College", "City College of San Fernando", "Systems Plus College"]
+LOCATIONS = ["Angeles City, Pampanga", "San Fernando, Pampanga", "Mabalacat City, Pampanga", "Malolos, Bulacan"]
+TUITIONS = [15000, 22000, 40000, 60000, None, "N/A", float("nan")]
+
+
+def make_programs(n: int = 300, dim: int = 32, seed: int = 0) -> list[dict]:
+    """Synthetic program_vectors documents; vectors cluster by category like real descriptions do."""
+    rng = np.random.default_rng(seed)
+    centres = rng.normal(size=(len(CATEGORIES), dim))
+    programs = []
+    for i in range(n):
+        c = i % len(CATEGORIES)
+        programs.append({
+            "_id": f"p{i}",
+            "school": SCHOOLS[i % len(SCHOOLS)],
+            "name": f"Program {i}",
+            "description": f"Description {i}",
+            "category": CATEGORIES[c],
+            "school_type": "Private" if i % 3 else "Public",
+            "location": LOCATIONS[i % len(LOCATIONS)],
+            "tuition_per_semester": TUITIONS[i % len(TUITIONS)],
+            "embedding_model": MODEL,
+            "vector": (centres[c] + 0.6 * rng.normal(size=dim)).tolist(),
+        })
+    return programs
+
+
+def make_rankings() -> dict:
+    return {
+        "Business": [{"school": "Holy Angel University", "rating": 0.9},
+                     {"school": "Angeles University Foundation", "rating": 0.7}],
+        "Engineering": [{"school": "Pampanga State University", "rating": 0.8}],
+        "Healthcare": [{"school": "Angeles University Foundation", "rating": 0.95}],
+    }
+
+
+def make_grade_profiles() -> list[dict]:
+    return [
+        {"category": "Business", "profile": {"Mathematics": 0.9, "English": 0.85, "Filipino": 0.7}},
+        {"category": "Engineering", "grade_weights": {"Mathematics": 0.95, "Science": 0.9, "ICT": 0.8}},
+        {"category": "Healthcare", "subjects": {"Science": 0.95, "English": 0.8}},
+    ]
+
+
+@pytest.fixture
+def corpus_docs():
+    return make_programs(), make_rankings(), make_grade_profiles()
+
+
+@pytest.fixture
+def build(corpus_docs):
+    """ProgramIndex over the synthetic corpus; keyword options are passed through."""
+    from program_index import ProgramIndex
+
+    programs, rankings, profiles = corpus_docs
+
+    def _build(**options):
+        return ProgramIndex(programs, rankings, profiles, embedding_model=MODEL, **options)
+
+    return _build
+
+
+@pytest.fixture
+def queries(corpus_docs):
+    """Questionnaire-like vectors: near one program's category, plus one unrelated direction."""
+    programs = corpus_docs[0]
+    rng = np.random.default_rng(1)
+    near = [np.asarray(programs[i]["vector"]) + 0.5 * rng.normal(size=32) for i in (0, 7, 13, 21)]
+    return near + [rng.normal(size=32)]
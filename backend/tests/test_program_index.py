@@ -0,0 +1,263 @@
+import numpy as np
+import pytest
+
+from conftest import make_grade_profiles
+from program_index import ProgramIndex, normalize_subject_name, select_top_k
+
+
+def reference_grade_similarity(user_grades: dict, profile: dict) -> float:
+    """Per-program grade cosine from the original recommendation loop."""
+    user = {normalize_subject_name(k): v for k, v in user_grades.items()}
+    prof = {normalize_subject_name(k): v for k, v in profile.items()}
+    subjects = sorted(set(user) & set(prof))
+    if not subjects:
+        return 0.0
+    u = np.array([user[s] for s in subjects], dtype=np.float64)
+    p = np.array([prof[s] for s in subjects], dtype=np.float64)
+    return float(u @ p / (np.linalg.norm(u) * np.linalg.norm(p)))
+
+
+# -----------------------------
+# select_top_k
+# -----------------------------
+@pytest.mark.parametrize("k", [0, 1, 3, 10, 25, 100])
+def test_select_top_k_matches_stable_descending_sort(k):
+    scores = np.random.default_rng(0).integers(0, 5, size=40).astype(np.float64)  # many ties
+    expected = sorted(range(len(scores)), key=lambda i: scores[i], reverse=True)[:k]
+    assert select_top_k(scores, k).tolist() == expected
+
+
+def test_select_top_k_breaks_ties_by_position():
+    assert select_top_k(np.array([0.5, 0.9, 0.5, 0.9, 0.5]), 3).tolist() == [1, 3, 0]
+    assert select_top_k(np.array([], dtype=np.float32), 5).tolist() == []
+
+
+# -----------------------------
+# Grade similarity
+# -----------------------------
+@pytest.mark.parametrize("user_grades", [
+    {"math": 90, "Science": 85, "english": 88},
+    {"General Mathematics": 95, "Oral Communication": 80, "filipino": 82, "ICT": 91},
+    {"biology": 89},
+    {"Music": 90},
+    {},
+])
+def test_grade_similarities_match_per_program_loop(build, corpus_docs, user_grades):
+    index = build()
+    profiles = {}
+    for g in make_grade_profiles():
+        profiles.setdefault(g["category"].lower(), g.get("profile") or g.get("subjects") or g.get("grade_weights"))
+    expected = [reference_grade_similarity(user_grades, profiles.get(p["category"].lower(), {}))
+                for p in index.programs]
+    np.testing.assert_allclose(index.grade_similarities(user_grades), expected, atol=1e-12)
+
+    rows = np.arange(0, len(index), 7)
+    np.testing.assert_allclose(index.grade_similarities(user_grades, rows), np.asarray(expected)[rows], atol=1e-12)
+
+
+def test_grade_similarities_skip_non_numeric_grades(build):
+    index = build()
+    np.testing.assert_allclose(index.grade_similarities({"math": "n/a", "science": 90}),
+                               index.grade_similarities({"science": 90}))
+
+
+def test_grade_weights_profiles_are_loaded(build):
+    index = build()
+    assert index.grade_matrix.shape[0] == 3
+    assert "ict" in index.grade_subjects
+
+
+# -----------------------------
+# Filters
+# -----------------------------
+def reference_filter(programs, school_type=None, locations=None, max_budget=None) -> list[int]:
+    kept = []
+    for row, entry in enumerate(programs):
+        if school_type and school_type.lower() != "any" and entry.get("school_type", "").lower() != school_type.lower():
+            continue
+        if locations and all(loc.lower() not in entry.get("location", "").lower() for loc in locations):
+            continue
+        tuition = entry.get("tuition_per_semester")
+        if max_budget is not None and tuition is not None and isinstance(tuition, (int, float)) \
+                and tuition > max_budget:
+            continue
+        kept.append(row)
+    return kept
+
+
+@pytest.mark.parametrize("filters", [
+    {},
+    {"school_type": "any"},
+    {"school_type": "PRIVATE"},
+    {"school_type": "unknown"},
+    {"locations": ["angeles"]},
+    {"locations": ["Mabalacat", "Bulacan"]},
+    {"locations": ["Nowhere"]},
+    {"max_budget": 30000},
+    {"max_budget": 0},
+    {"school_type": "private", "locations": ["Pampanga"], "max_budget": 45000},
+])
+def test_filter_mask_matches_per_program_loop(build, filters):
+    index = build()
+    assert np.flatnonzero(index.filter_mask(**filters)).tolist() == reference_filter(index.programs, **filters)
+
+
+def test_budget_keeps_programs_with_unknown_tuition(build):
+    index = build()
+    mask = index.filter_mask(max_budget=1)
+    for row, program in enumerate(index.programs):
+        tuition = program["tuition_per_semester"]
+        unknown = not isinstance(tuition, (int, float)) or np.isnan(tuition)
+        assert mask[row] == unknown
+
+
+# -----------------------------
+# Validation
+# -----------------------------
+def test_broken_documents_are_quarantined(corpus_docs):
+    programs, rankings, profiles = corpus_docs
+    broken = [
+        {"_id": "a", "school": "X", "name": "short vector", "vector": [1.0, 2.0]},
+        {"_id": "b", "school": "X", "name": "no vector"},
+        {"_id": "c", "school": "X", "name": "nan", "vector": [float("nan")] * 32},
+        {"_id": "d", "school": 5, "name": "bad school", "vector": [1.0] * 32},
+        {"_id": "e", "school": "X", "name": "other model", "vector": [1.0] * 32, "embedding_model": "other/model"},
+    ]
+    index = ProgramIndex(programs + broken, rankings, profiles, embedding_model=programs[0]["embedding_model"])
+    assert len(index) == len(programs)
+    assert index.quarantined_count == len(broken)
+    assert {q["doc_id"] for q in index.quarantine if q["action"] == "quarantined"} == set("abcde")
+
+
+def test_empty_corpus_builds_an_empty_index():
+    index = ProgramIndex([], {}, [])
+    assert len(index) == 0 and index.dim == 0
+    assert index.interest_scores(np.ones(4)).shape == (0,)
+    assert index.filter_mask(max_budget=100).shape == (0,)
+
+
+# -----------------------------
+# Scoring, storage modes and retrieval
+# -----------------------------
+def test_interest_scores_are_cosine_similarities(build, corpus_docs, queries):
+    index = build()
+    vectors = np.array([p["vector"] for p in corpus_docs[0]])
+    for query in queries:
+        expected = vectors @ query / (np.linalg.norm(vectors, axis=1) * np.linalg.norm(query))
+        np.testing.assert_allclose(index.interest_scores(query), expected, atol=1e-5)
+        rows = np.arange(3, len(index), 5)
+        np.testing.assert_allclose(index.interest_scores(query, rows), expected[rows], atol=1e-5)
+
+
+@pytest.mark.parametrize("storage,atol", [("float16", 2e-3), ("int8", 2e-2)])
+def test_compact_storage_approximates_float32(build, queries, storage, atol):
+    exact, compact = build(), build(storage=storage)
+    assert compact.matrix_bytes() < exact.matrix_bytes()
+    for query in queries:
+        np.testing.assert_allclose(compact.interest_scores(query), exact.interest_scores(query), atol=atol)
+
+
+@pytest.mark.parametrize("storage", ["float16", "int8"])
+def test_rescoring_restores_exact_scores_for_top_candidates(build, queries, storage):
+    exact, compact = build(), build(storage=storage, rescore_candidates=20)
+    for query in queries:
+        expected = exact.interest_scores(query)
+        scores = compact.interest_scores(query)
+        top = select_top_k(scores, 10)
+        np.testing.assert_allclose(scores[top], expected[top], atol=1e-6)
+        rows = np.arange(0, len(exact), 2)
+        subset = compact.interest_scores(query, rows)
+        top = select_top_k(subset, 10)
+        np.testing.assert_allclose(subset[top], expected[rows][top], atol=1e-6)
+
+    everything = build(storage=storage, rescore_candidates=len(exact))
+    for query in queries:
+        np.testing.assert_allclose(everything.interest_scores(query), exact.interest_scores(query), atol=1e-6)
+
+
+def test_pca_keeps_scores_on_the_cosine_scale(corpus_docs, queries):
+    # Vectors spanning an 8-dim subspace: 8 components lose nothing, so scores must match exactly
+    programs, rankings, profiles = corpus_docs
+    basis = np.random.default_rng(2).normal(size=(8, 32))
+    low_rank = [{**p, "vector": (np.asarray(p["vector"])[:8] @ basis).tolist()} for p in programs]
+    exact = ProgramIndex(low_rank, rankings, profiles)
+    reduced = ProgramIndex(low_rank, rankings, profiles, pca_dimensions=8)
+    assert reduced.matrix.shape[1] == 8 and reduced.pca_explained_variance == pytest.approx(1.0)
+    for query in queries:
+        np.testing.assert_allclose(reduced.interest_scores(query), exact.interest_scores(query), atol=1e-5)
+
+
+def test_ivf_probing_every_list_is_exact(build, queries):
+    index = build(retrieval="ivf", ivf_lists=8, ann_min_programs=0)
+    assert index.retrieval == "ivf" and len(index.router) == 8
+    assert sorted(index.router.rows.tolist()) == list(range(len(index)))
+    mask = index.filter_mask(school_type="private")
+    for query in queries:
+        assert index.candidate_rows(query, mask, n_probe=8).tolist() == np.flatnonzero(mask).tolist()
+
+
+def test_ivf_respects_mask_and_min_rows(build, queries):
+    index = build(retrieval="ivf", ivf_lists=8, ivf_probes=1, ann_min_programs=0)
+    mask = index.filter_mask(locations=["Bulacan"])
+    for query in queries:
+        rows = index.candidate_rows(query, mask, min_rows=40)
+        assert mask[rows].all()
+        assert len(rows) >= min(40, mask.sum())
+        assert rows.tolist() == sorted(rows.tolist())
+
+
+def test_ivf_is_skipped_for_small_corpora(build):
+    index = build(retrieval="ivf", ann_min_programs=10_000)
+    assert index.retrieval == "exact" and index.router is None
+
+
+def test_category_routing_scores_whole_categories(build, queries):
+    index = build(retrieval="category", category_probes=1)
+    assert set(index.router.names) == {p["category"] for p in index.programs}
+    mask = np.ones(len(index), dtype=bool)
+    for query in queries:
+        rows = index.candidate_rows(query, mask)
+        categories = {index.programs[r]["category"] for r in rows}
+        assert len(categories) == 1
+        category = categories.pop()
+        assert rows.tolist() == [r for r, p in enumerate(index.programs) if p["category"] == category]
+
+
+# -----------------------------
+# Serving bundles
+# -----------------------------
+@pytest.mark.parametrize("options", [
+    {},
+    {"storage": "int8", "rescore_candidates": 10},
+    {"storage": "float16"},
+    {"pca_dimensions": 16},
+    {"retrieval": "ivf", "ivf_lists": 6, "ivf_probes": 2, "ann_min_programs": 0},
+    {"retrieval": "category", "category_probes": 2},
+])
+def test_bundle_round_trip(build, queries, tmp_path, options):
+    built = build(**options)
+    built.save_bundle(str(tmp_path / "v0"))
+    mapped = ProgramIndex.from_bundle(str(tmp_path / "v0"))
+
+    assert mapped.bundle_path == str(tmp_path / "v0")
+    assert [p["_id"] for p in mapped.programs] == [p["_id"] for p in built.programs]
+    assert (mapped.retrieval, mapped.storage, mapped.dim) == (built.retrieval, built.storage, built.dim)
+    np.testing.assert_array_equal(mapped.school_ratings, built.school_ratings)
+    grades = {"math": 90, "science": 80}
+    np.testing.assert_array_equal(mapped.grade_similarities(grades), built.grade_similarities(grades))
+    filters = {"school_type": "private", "locations": ["angeles"], "max_budget": 30000}
+    np.testing.assert_array_equal(mapped.filter_mask(**filters), built.filter_mask(**filters))
+    mask = built.filter_mask(school_type="private")
+    for query in queries:
+        rows = built.candidate_rows(query, mask, min_rows=20)
+        np.testing.assert_array_equal(mapped.candidate_rows(query, mask, min_rows=20), rows)
+        np.testing.assert_allclose(mapped.interest_scores(query, rows), built.interest_scores(query, rows), rtol=1e-6)
+
+
+def test_bundle_snapshots_are_read_only(build, tmp_path):
+    build().save_bundle(str(tmp_path / "v0"))
+    mapped = ProgramIndex.from_bundle(str(tmp_path / "v0"))
+    with pytest.raises(AttributeError):
+        mapped.version = 2
+    with pytest.raises(ValueError):
+        mapped.matrix[0, 0] = 1.0
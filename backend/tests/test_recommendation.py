@@ -0,0 +1,137 @@
+from collections import Counter
+
+import numpy as np
+import pytest
+
+import corpus
+import recommendation
+from program_index import ProgramIndex, normalize_subject_name
+
+from conftest import MODEL
+
+
+def baseline_recommend(combined_vector, programs, rankings_data, grade_profiles, user_grades=None,
+                       school_type=None, locations=None, max_budget=None):
+    """The original per-program scoring loop, kept as the reference for rank_programs()."""
+    def get_school_rating(school_name, category):
+        for school in rankings_data.get(category, []):
+            if school_name.lower() in school["school"].lower():
+                return school["rating"]
+        return None
+
+    def get_grade_profile(category):
+        for g in grade_profiles:
+            if g["category"].lower() == category.lower():
+                return g.get("profile") or g.get("subjects") or g.get("grade_weights") or {}
+        return {}
+
+    def compute_grade_similarity(grades, profile):
+        user = {normalize_subject_name(k): v for k, v in grades.items()}
+        prof = {normalize_subject_name(k): v for k, v in profile.items()}
+        subjects = list(set(user) & set(prof))
+        if not subjects:
+            return 0.0
+        u = np.array([user[s] for s in subjects], dtype=np.float64)
+        p = np.array([prof[s] for s in subjects], dtype=np.float64)
+        return float(u @ p / (np.linalg.norm(u) * np.linalg.norm(p)))
+
+    candidates = []
+    for entry in programs:
+        if school_type and school_type.lower() != "any" and entry.get("school_type", "").lower() != school_type.lower():
+            continue
+        if locations and all(loc.lower() not in entry.get("location", "").lower() for loc in locations):
+            continue
+        tuition = entry.get("tuition_per_semester")
+        if max_budget is not None and tuition is not None and isinstance(tuition, (int, float)) \
+                and tuition > max_budget:
+            continue
+
+        vector = np.asarray(entry["vector"], dtype=np.float64)
+        interest = float(vector @ combined_vector / (np.linalg.norm(vector) * np.linalg.norm(combined_vector)))
+        category = entry.get("category", "")
+        grade = compute_grade_similarity(user_grades or {}, get_grade_profile(category)) if user_grades else 0.0
+        rating = get_school_rating(entry.get("school", ""), category) or 0
+        final = 0.7 * interest + recommendation.GRADE_WEIGHT * grade + recommendation.CATEGORY_WEIGHT * rating
+        candidates.append({"school": entry["school"], "program": entry["name"], "similarity_score": interest,
+                           "grade_similarity": grade, "final_score": final, "school_rank": float(rating),
+                           "category": category})
+
+    strong = [p for p in candidates if p["similarity_score"] >= recommendation.THRESHOLD]
+    weak = [p for p in candidates if p["similarity_score"] < recommendation.THRESHOLD]
+    categories = [p["category"] for p in strong if p["category"]]
+    top_category = Counter(categories).most_common(1)[0][0] if categories else None
+    final_strong = sorted(strong, key=lambda x: x["final_score"], reverse=True)
+    final_weak = sorted(weak, key=lambda x: x["final_score"], reverse=True)
+    top_schools = rankings_data.get(top_category, [])[:5] if top_category else []
+
+    if not final_strong:
+        return {"type": "fallback", "results": final_weak[:6], "weak_matches": final_weak[6:12],
+                "matched_category": top_category, "top_schools_for_category": top_schools}
+    return {"type": "exact", "results": final_strong[:10], "weak_matches": final_weak[:10],
+            "matched_category": top_category, "top_schools_for_category": top_schools}
+
+
+def assert_same_results(actual: list[dict], expected: list[dict]):
+    assert [(r["school"], r["program"]) for r in actual] == [(r["school"], r["program"]) for r in expected]
+    for key in ("similarity_score", "grade_similarity", "final_score", "school_rank"):
+        np.testing.assert_allclose([r[key] for r in actual], [r[key] for r in expected], atol=1e-5)
+
+
+@pytest.fixture
+def serve(monkeypatch, corpus_docs):
+    """Publish an index over the synthetic corpus in place of the one built from Mongo."""
+    def _serve(**options):
+        programs, rankings, profiles = corpus_docs
+        index = ProgramIndex(programs, rankings, profiles, embedding_model=MODEL, **options)
+        monkeypatch.setattr(corpus, "get_index", lambda: index)
+        return index
+
+    return _serve
+
+
+@pytest.mark.parametrize("request_filters", [
+    {},
+    {"user_grades": {"math": 90, "Science": 85, "english": 88}},
+    {"school_type": "Private", "locations": ["Angeles"], "max_budget": 30000},
+    {"school_type": "public", "locations": ["San Fernando", "Malolos, Bulacan"]},
+    {"school_type": "xyz"},
+    {"locations": ["Nowhere"]},
+    {"school_type": "PRIVATE", "max_budget": 20000, "user_grades": {"Mathematics": "95", "filipino": 80}},
+])
+def test_rank_programs_matches_baseline_loop(serve, corpus_docs, queries, request_filters):
+    serve()
+    programs, rankings, profiles = corpus_docs
+    for query in queries:
+        actual = recommendation.rank_programs(query, **request_filters)
+        expected = baseline_recommend(query, programs, rankings, profiles, **request_filters)
+        assert actual["type"] == expected["type"]
+        assert actual["matched_category"] == expected["matched_category"]
+        assert list(actual["top_schools_for_category"]) == expected["top_schools_for_category"]
+        assert_same_results(actual["results"], expected["results"])
+        assert_same_results(actual["weak_matches"], expected["weak_matches"])
+
+
+def test_exact_ivf_and_rescored_int8_agree(serve, queries):
+    serve()
+    expected = [recommendation.rank_programs(q, school_type="private") for q in queries]
+    serve(retrieval="ivf", ivf_lists=6, ivf_probes=6, ann_min_programs=0, storage="int8", rescore_candidates=300)
+    for query, reference in zip(queries, expected):
+        actual = recommendation.rank_programs(query, school_type="private")
+        assert_same_results(actual["results"], reference["results"])
+        assert_same_results(actual["weak_matches"], reference["weak_matches"])
+
+
+def test_no_answers_and_empty_index_fall_back(serve, monkeypatch):
+    serve()
+    assert recommendation.rank_programs(None)["type"] == "fallback"
+
+    empty = ProgramIndex([], {}, [])
+    monkeypatch.setattr(corpus, "get_index", lambda: empty)
+    result = recommendation.rank_programs(np.ones(32))
+    assert result["type"] == "fallback" and result["results"] == [] and result["weak_matches"] == []
+
+
+def test_dimension_mismatch_is_reported(serve):
+    serve()
+    with pytest.raises(RuntimeError, match="re-embed"):
+        recommendation.rank_programs(np.ones(16))
@@ -0,0 +1,72 @@
+"""Recall@k of IVF or category routing against exact search, per number of probed groups.
+
+Queries are the fixed questionnaire set plus a sample of program vectors
+(each program looking for its neighbours), so the report is meaningful even
+for a catalog much larger than the questionnaire set.
+
+    python -m tools.ann_recall_report --lists 0 --probes 1 2 4 8 16
+    python -m tools.ann_recall_report --retrieval category --probes 1 2 3 4
+"""
+import argparse
+import json
+import time
+
+import numpy as np
+
+import corpus
+from program_index import ProgramIndex, select_top_k
+from recommendation import build_query_vector
+from tools.common import QUERY_SET, overlap, percentiles_ms, top_rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--retrieval", choices=["ivf", "category"], default="ivf")
+    parser.add_argument("--lists", type=int, default=corpus.IVF_LISTS, help="0 = sqrt(number of programs)")
+    parser.add_argument("--probes", type=int, nargs="+", default=[1, 2, 4, 8, 16, 32])
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--sample", type=int, default=200, help="program vectors used as extra queries")
+    args = parser.parse_args()
+
+    programs, rankings, profiles = corpus.read_corpus()
+    exact = corpus.load_index(retrieval="exact", storage="float32", pca_dimensions=0)
+    start = time.perf_counter()
+    ivf = ProgramIndex(programs, rankings, profiles, embedding_model=exact.embedding_model,
+                       retrieval=args.retrieval, ivf_lists=args.lists, ann_min_programs=0)
+    build_seconds = time.perf_counter() - start
+
+    rng = np.random.default_rng(0)
+    sample = rng.choice(len(exact), min(args.sample, len(exact)), replace=False)
+    queries = [build_query_vector(answers) for answers in QUERY_SET] + list(exact.vectors(sample))
+    everything = np.ones(len(exact), dtype=bool)
+
+    report = {"programs": len(exact), "retrieval": args.retrieval, "groups": len(ivf.router), "build_seconds": round(build_seconds, 2),
+              "k": args.k, "queries": len(queries), "exact_latency": None, "probes": []}
+    samples = []
+    for query in queries:
+        t = time.perf_counter()
+        top_rows(exact, query, args.k)
+        samples.append(time.perf_counter() - t)
+    report["exact_latency"] = percentiles_ms(samples)
+    exact_tops = [top_rows(exact, query, args.k) for query in queries]
+
+    for n_probe in args.probes:
+        recalls, touched, samples = [], [], []
+        for query, exact_top in zip(queries, exact_tops):
+            t = time.perf_counter()
+            rows = ivf.candidate_rows(query, everything, min_rows=args.k, n_probe=n_probe)
+            approx_top = rows[select_top_k(ivf.interest_scores(query, rows), args.k)]
+            samples.append(time.perf_counter() - t)
+            recalls.append(overlap(exact_top, [int(r) for r in approx_top]))
+            touched.append(len(rows) / len(ivf))
+        report["probes"].append({
+            "n_probe": n_probe,
+            f"recall@{args.k}": {"mean": round(float(np.mean(recalls)), 4), "min": round(min(recalls), 4)},
+            "corpus_touched": round(float(np.mean(touched)), 4),
+            "latency": percentiles_ms(samples),
+        })
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
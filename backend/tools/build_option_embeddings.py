@@ -0,0 +1,39 @@
+"""Precompute embeddings for every questionnaire option phrase (OPTION_FAST_PATH=1).
+
+    python -m tools.build_option_embeddings
+
+Re-run after changing EMBEDDING_MODEL or the option lists, then restart the API
+workers: each worker reads the table once.
+"""
+import argparse
+from datetime import datetime
+
+import embedding
+import option_phrases
+from db import db
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--dry-run", action="store_true", help="encode but do not write anything")
+    args = parser.parse_args()
+
+    model_name = embedding.canonical_model_name(embedding.EMBEDDING_MODEL)
+    table = option_phrases.build_table()
+    print(f"🧾 Encoded {len(table)} option phrases with {model_name}")
+    if args.dry_run:
+        print("Dry run: nothing written")
+        return
+
+    now = datetime.utcnow()
+    collection = db[option_phrases.OPTION_COLLECTION]
+    collection.delete_many({})
+    collection.insert_many([
+        {"phrase": phrase, "vector": vector.tolist(), "embedding_model": model_name, "updated_at": now}
+        for phrase, vector in table.items()
+    ])
+    print(f"✅ Stored {len(table)} option vectors in {option_phrases.OPTION_COLLECTION}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,34 @@
+"""Write the serving bundle for the current corpus version.
+
+    SERVING_BUNDLE_DIR=bundles python -m tools.build_serving_bundle
+
+The bundle (bundles/v<version>/) holds the embedding matrix and every other
+index array as .npy files plus the program metadata, rankings join and grade
+profiles in index.json. Workers started with the same SERVING_BUNDLE_DIR and
+index settings memory-map it instead of scanning program_vectors, as long as
+the corpus fingerprint recorded with the version still matches.
+"""
+import argparse
+import os
+
+import corpus
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--dir", default=corpus.SERVING_BUNDLE_DIR or "bundles")
+    args = parser.parse_args()
+    corpus.SERVING_BUNDLE_DIR = args.dir
+
+    version = corpus.read_corpus_version()
+    fingerprint = corpus.read_corpus_fingerprint()
+    snapshot = corpus.build_index(version)
+    path = corpus.write_bundle(snapshot, fingerprint, replace=True)
+    size = sum(entry.stat().st_size for entry in os.scandir(path))
+    print(f"✅ Wrote serving bundle v{version} to {path} ({len(snapshot)} programs, {size / 2**20:.1f} MB)")
+    if corpus.open_bundle(version, fingerprint) is None:  # read it back the way workers will
+        raise SystemExit("❌ The bundle could not be opened")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+"""Shared helpers for the offline benchmark / quality report scripts.
+
+Run the scripts from the backend folder, e.g. `python -m tools.quantization_report`.
+"""
+import time
+
+import numpy as np
+
+from program_index import select_top_k
+
+# Fixed questionnaire set used to compare encoders / index modes against each other
+QUERY_SET = [
+    {"academics": ["Mathematics", "ICT"], "fields": ["Information Technology"], "activities": ["Problem-solving"]},
+    {"academics": ["Biology", "Chemistry"], "fields": ["Healthcare"], "goals": ["Improving lives"],
+     "environment": ["Hospital or clinic"]},
+    {"fields": ["Engineering", "Architecture"], "activities": ["Hands-on building/Repairing"],
+     "environment": ["Workshop or laboratory"]},
+    {"academics": ["Economics"], "fields": ["Entrepreneurship"], "goals": ["Growing a business"],
+     "environment": ["Corporate office"]},
+    {"academics": ["English", "History"], "fields": ["Education"], "activities": ["Mentoring/Guiding others"],
+     "goals": ["Educating others"]},
+    {"academics": ["Visual Arts"], "fields": ["Graphic Design", "Film & Animation"], "activities": ["Designing/Creating"],
+     "environment": ["Creative studio"]},
+    {"fields": ["Law & Governance"], "activities": ["Presenting/Speaking"], "goals": ["Promoting fairness & justice"]},
+    {"academics": ["Geography"], "fields": ["Environmental Science"], "goals": ["Protecting the environment"],
+     "environment": ["Outdoor/nature setting"]},
+    {"fields": ["Research & Development"], "activities": ["Researching/Analyzing", "Data Interpretation"],
+     "goals": ["Driving innovation"], "environment": ["Tech-driven workspace"]},
+    {"academics": ["Sports"], "activities": ["Organizing/Planning"], "environment": ["Fast-paced/high-pressure environment"]},
+    {"fields": ["Community & Social Work"], "goals": ["Improving lives"],
+     "custom": {"goals": "I want to help families in my province get better public services"}},
+    {"academics": ["Mathematics"], "custom": {"fields": "accounting and auditing for big companies"},
+     "environment": ["Collaborative team setting"]},
+]
+
+
+def top_rows(index, query_vector, k: int = 10) -> list[int]:
+    """Rows of the k programs with the highest interest score."""
+    return [int(r) for r in select_top_k(index.interest_scores(query_vector), k)]
+
+
+def overlap(a, b) -> float:
+    """Fraction of `a` that also appears in `b` (order-insensitive top-k agreement)."""
+    return len(set(a) & set(b)) / len(a) if a else 1.0
+
+
+def percentiles_ms(samples: list[float]) -> dict:
+    values = np.array(samples) * 1000
+    return {"p50_ms": round(float(np.percentile(values, 50)), 2),
+            "p99_ms": round(float(np.percentile(values, 99)), 2),
+            "mean_ms": round(float(values.mean()), 2)}
+
+
+def time_calls(fn, inputs, repeats: int = 3) -> dict:
+    """Latency of fn(x) over every input, repeated; the first pass is a discarded warmup."""
+    for x in inputs:
+        fn(x)
+    samples = []
+    for _ in range(repeats):
+        for x in inputs:
+            start = time.perf_counter()
+            fn(x)
+            samples.append(time.perf_counter() - start)
+    return percentiles_ms(samples)
@@ -0,0 +1,70 @@
+"""Compare embedding models for serving: load time, RSS, query latency and top-10 overlap.
+
+The corpus is re-embedded in memory with each model (nothing is written), and
+top-10 results on the fixed query set are compared against the first model.
+
+    python -m tools.model_comparison_report \\
+        --models sentence-transformers/all-mpnet-base-v2 sentence-transformers/all-MiniLM-L6-v2
+"""
+import argparse
+import gc
+import json
+import time
+
+import numpy as np
+import psutil
+
+import corpus
+import embedding
+from bulk_encode import BULK_BATCH_SIZE, encode_bulk
+from program_index import ProgramIndex
+from recommendation import build_query_vector
+from tools.common import QUERY_SET, overlap, time_calls, top_rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--models", nargs="+",
+                        default=[embedding.EMBEDDING_MODEL, "sentence-transformers/all-MiniLM-L6-v2"])
+    parser.add_argument("--batch-size", type=int, default=BULK_BATCH_SIZE)
+    args = parser.parse_args()
+
+    from sentence_transformers import SentenceTransformer
+
+    programs = [p for p in corpus.load_index().programs if p.get("description")]
+    process = psutil.Process()
+    report, reference_top = [], None
+
+    for name in args.models:
+        name = embedding.canonical_model_name(name)
+        gc.collect()
+        rss_before = process.memory_info().rss
+        start = time.perf_counter()
+        model = SentenceTransformer(name, device="cpu")
+        load_seconds = time.perf_counter() - start
+        rss_delta = process.memory_info().rss - rss_before
+
+        vectors = encode_bulk([p["description"] for p in programs], model, args.batch_size)
+        index = ProgramIndex([{**p, "vector": v.tolist(), "embedding_model": name} for p, v in zip(programs, vectors)],
+                             embedding_model=name)
+        tops = [top_rows(index, build_query_vector(answers, model)) for answers in QUERY_SET]
+        if reference_top is None:
+            reference_top = tops
+        overlaps = [overlap(ref, top) for ref, top in zip(reference_top, tops)]
+
+        report.append({
+            "model": name,
+            "dimension": model.get_sentence_embedding_dimension(),
+            "load_seconds": round(load_seconds, 2),
+            "rss_delta_mb": round(rss_delta / 2**20, 1),
+            "query_latency": time_calls(lambda answers: build_query_vector(answers, model), QUERY_SET),
+            "top10_overlap_vs_first": {"mean": round(float(np.mean(overlaps)), 3), "min": round(min(overlaps), 3)},
+        })
+        del model, index
+        gc.collect()
+
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+"""Compare the option-phrase fast path against exact concatenated-text encoding.
+
+For every questionnaire in the fixed query set, reports the cosine between the
+two query vectors, top-10 overlap of the resulting program rankings, and
+whether the fast path needed the model at all (custom text).
+
+    python -m tools.option_fast_path_report
+"""
+import json
+
+import numpy as np
+
+import corpus
+import embedding
+import option_phrases
+from recommendation import answer_items, build_query_vector, combine_field_vectors
+from tools.common import QUERY_SET, overlap, time_calls, top_rows
+
+
+def composed_query_vector(answers: dict, table: dict, model):
+    items = answer_items(answers)
+    free = option_phrases.free_texts(items, table)
+    free_vectors = dict(zip(free, model.encode(free))) if free else {}
+    return combine_field_vectors(option_phrases.compose(items, table, free_vectors)), len(free)
+
+
+def main():
+    index = corpus.load_index()
+    model = embedding.get_model()  # called directly so neither path is served from the embedding cache
+    table = option_phrases.build_table(model)
+
+    rows = []
+    for answers in QUERY_SET:
+        exact = build_query_vector(answers, model)
+        fast, free = composed_query_vector(answers, table, model)
+        cosine = float(np.dot(exact, fast) / (np.linalg.norm(exact) * np.linalg.norm(fast)))
+        rows.append({"cosine": cosine, "top10_overlap": overlap(top_rows(index, exact), top_rows(index, fast)),
+                     "model_calls": free})
+
+    option_only = [r for r in rows if r["model_calls"] == 0]
+    report = {
+        "model": embedding.EMBEDDING_MODEL,
+        "queries": len(rows),
+        "option_only_queries": len(option_only),
+        "query_cosine": {"mean": round(float(np.mean([r["cosine"] for r in rows])), 4),
+                         "min": round(min(r["cosine"] for r in rows), 4)},
+        "top10_overlap": {"mean": round(float(np.mean([r["top10_overlap"] for r in rows])), 3),
+                          "min": round(min(r["top10_overlap"] for r in rows), 3),
+                          "option_only_mean": round(float(np.mean([r["top10_overlap"] for r in option_only])), 3)
+                          if option_only else None},
+        "latency": {
+            "exact": time_calls(lambda answers: build_query_vector(answers, model), QUERY_SET),
+            "fast_path": time_calls(lambda answers: composed_query_vector(answers, table, model), QUERY_SET),
+        },
+    }
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,53 @@
+"""Sweep PCA target dimensions against full-dimension scoring.
+
+For each target dimension reports explained variance, matrix memory, scoring
+latency and top-10 overlap with the unprojected index, so PCA_DIMENSIONS can
+be set to the smallest size that preserves recommendations.
+
+    python -m tools.pca_sweep_report --dims 64 128 256 384
+"""
+import argparse
+import json
+
+import numpy as np
+
+import corpus
+from program_index import ProgramIndex
+from recommendation import build_query_vector
+from tools.common import QUERY_SET, overlap, time_calls, top_rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--dims", type=int, nargs="+", default=[64, 128, 256, 384])
+    parser.add_argument("--sample", type=int, default=200, help="program vectors used as extra queries")
+    args = parser.parse_args()
+
+    programs, rankings, profiles = corpus.read_corpus()
+    full = corpus.load_index(retrieval="exact", storage="float32", pca_dimensions=0)
+    rng = np.random.default_rng(0)
+    sample = rng.choice(len(full), min(args.sample, len(full)), replace=False)
+    queries = [build_query_vector(answers) for answers in QUERY_SET] + list(full.vectors(sample))
+    full_tops = [top_rows(full, query) for query in queries]
+
+    report = {"programs": len(full), "queries": len(queries), "full": {
+        "dimension": full.dim,
+        "matrix_mb": round(full.matrix.nbytes / 2**20, 3),
+        "scoring_latency": time_calls(full.interest_scores, queries),
+    }, "sweep": []}
+    for dims in args.dims:
+        index = ProgramIndex(programs, rankings, profiles, embedding_model=full.embedding_model, pca_dimensions=dims)
+        overlaps = [overlap(ref, top_rows(index, query)) for ref, query in zip(full_tops, queries)]
+        report["sweep"].append({
+            "dimension": index.matrix.shape[1],
+            "explained_variance": index.pca_explained_variance,
+            "matrix_mb": round(index.matrix.nbytes / 2**20, 3),
+            "projection_mb": round((index.projection.nbytes + index.projection_mean.nbytes) / 2**20, 3),
+            "scoring_latency": time_calls(index.interest_scores, queries),
+            "top10_overlap": {"mean": round(float(np.mean(overlaps)), 4), "min": round(min(overlaps), 4)},
+        })
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+"""Compare the dynamic int8 encoder against the float32 one.
+
+Reports model size, query encoding latency, top-10 drift on the fixed query
+set, and whether vectors already stored in program_vectors stay compatible.
+
+    python -m tools.quantization_report
+"""
+import json
+
+import numpy as np
+
+import corpus
+import embedding
+from recommendation import build_query_vector
+from tools.common import QUERY_SET, overlap, time_calls, top_rows
+
+# Stored (float32) program vectors are considered compatible with int8 queries
+# when int8 re-embeddings of their descriptions stay this close (cosine).
+COMPATIBLE_COSINE = 0.99
+SAMPLE_PROGRAMS = 50
+
+
+def main():
+    index = corpus.load_index(storage="float32", pca_dimensions=0)
+    fp32 = embedding._load_torch()
+    int8 = embedding._load_torch("int8")
+
+    report = {
+        "model": embedding.EMBEDDING_MODEL,
+        "size_bytes": {"float32": embedding.model_size_bytes(fp32), "int8": embedding.model_size_bytes(int8)},
+        "latency": {
+            "float32": time_calls(lambda answers: build_query_vector(answers, fp32), QUERY_SET),
+            "int8": time_calls(lambda answers: build_query_vector(answers, int8), QUERY_SET),
+        },
+    }
+    report["memory_saved_bytes"] = report["size_bytes"]["float32"] - report["size_bytes"]["int8"]
+    report["latency_gain_pct"] = round(
+        100 * (1 - report["latency"]["int8"]["mean_ms"] / report["latency"]["float32"]["mean_ms"]), 1
+    )
+
+    overlaps = []
+    for answers in QUERY_SET:
+        reference = top_rows(index, build_query_vector(answers, fp32))
+        candidate = top_rows(index, build_query_vector(answers, int8))
+        overlaps.append(overlap(reference, candidate))
+    report["top10_overlap"] = {"mean": round(float(np.mean(overlaps)), 3), "min": round(min(overlaps), 3)}
+
+    # Stored vectors came from the float32 model; check int8 lands close enough to mix with them
+    sample = [row for row, p in enumerate(index.programs) if p.get("description")][:SAMPLE_PROGRAMS]
+    fresh = np.asarray(int8.encode([index.programs[row]["description"] for row in sample]), dtype=np.float64)
+    stored = index.vectors(sample).astype(np.float64)
+    cosine = (fresh * stored).sum(axis=1) / (np.linalg.norm(fresh, axis=1) * np.linalg.norm(stored, axis=1))
+    report["stored_vectors"] = {
+        "min_cosine": round(float(cosine.min()), 4),
+        "compatible": bool(cosine.min() >= COMPATIBLE_COSINE),
+    }
+    if not report["stored_vectors"]["compatible"]:
+        report["stored_vectors"]["action"] = "re-embed program_vectors with the int8 model before enabling it"
+
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
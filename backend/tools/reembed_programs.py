@@ -0,0 +1,50 @@
+"""Re-embed every program description in program_vectors with the configured model.
+
+    EMBEDDING_MODEL=sentence-transformers/all-MiniLM-L6-v2 python -m tools.reembed_programs
+
+All API workers must run with the same EMBEDDING_MODEL afterwards: the serving
+index quarantines vectors tagged with any other model.
+"""
+import argparse
+from datetime import datetime
+
+from pymongo import UpdateOne
+
+import corpus
+import embedding
+from bulk_encode import BULK_BATCH_SIZE, encode_bulk
+from db import db
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--batch-size", type=int, default=BULK_BATCH_SIZE)
+    parser.add_argument("--dry-run", action="store_true", help="encode but do not write anything")
+    args = parser.parse_args()
+
+    model_name = embedding.canonical_model_name(embedding.EMBEDDING_MODEL)
+    collection = db["program_vectors"]
+    docs = list(collection.find({}, {"description": 1}))
+    todo = [d for d in docs if d.get("description")]
+    print(f"🧾 {len(todo)} of {len(docs)} programs have a description to embed with {model_name}")
+
+    vectors = encode_bulk([d["description"] for d in todo], batch_size=args.batch_size)
+
+    if args.dry_run:
+        print("Dry run: nothing written")
+        return
+
+    now = datetime.utcnow()
+    ops = [
+        UpdateOne({"_id": d["_id"]},
+                  {"$set": {"vector": v.tolist(), "embedding_model": model_name, "updated_at": now}})
+        for d, v in zip(todo, vectors)
+    ]
+    for i in range(0, len(ops), 500):
+        collection.bulk_write(ops[i:i + 500], ordered=False)
+    corpus.bump_corpus_version()
+    print(f"✅ Re-embedded {len(ops)} programs; workers will pick up the new corpus version")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,52 @@
+"""Memory and ranking fidelity of the compact matrix storage modes.
+
+For float32, float16 and int8 (each compact mode with and without exact
+float32 rescoring) reports matrix memory per 10k programs, top-10 agreement
+with float32 scoring and scoring latency.
+
+    python -m tools.storage_mode_report --rescore 100
+"""
+import argparse
+import json
+
+import numpy as np
+
+import corpus
+from program_index import ProgramIndex
+from recommendation import build_query_vector
+from tools.common import QUERY_SET, overlap, time_calls, top_rows
+
+PER_PROGRAMS = 10_000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rescore", type=int, default=100, help="candidates rescored in float32")
+    parser.add_argument("--sample", type=int, default=200, help="program vectors used as extra queries")
+    args = parser.parse_args()
+
+    programs, rankings, profiles = corpus.read_corpus()
+    reference = corpus.load_index(retrieval="exact", storage="float32", pca_dimensions=0)
+    rng = np.random.default_rng(0)
+    sample = rng.choice(len(reference), min(args.sample, len(reference)), replace=False)
+    queries = [build_query_vector(answers) for answers in QUERY_SET] + list(reference.vectors(sample))
+    reference_tops = [top_rows(reference, query) for query in queries]
+
+    modes = [("float32", 0), ("float16", 0), ("float16", args.rescore), ("int8", 0), ("int8", args.rescore)]
+    report = {"programs": len(reference), "dimension": reference.dim, "queries": len(queries), "modes": []}
+    for storage, rescore in modes:
+        index = ProgramIndex(programs, rankings, profiles, embedding_model=reference.embedding_model,
+                             storage=storage, rescore_candidates=rescore)
+        agreement = [overlap(ref, top_rows(index, query)) for ref, query in zip(reference_tops, queries)]
+        report["modes"].append({
+            "storage": storage,
+            "rescore_candidates": rescore,
+            "memory_per_10k_programs_mb": round(index.matrix_bytes() / max(len(index), 1) * PER_PROGRAMS / 2**20, 2),
+            "top10_agreement": {"mean": round(float(np.mean(agreement)), 4), "min": round(min(agreement), 4)},
+            "scoring_latency": time_calls(index.interest_scores, queries),
+        })
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
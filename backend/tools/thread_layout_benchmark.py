@@ -0,0 +1,92 @@
+"""p50/p99 /search-style latency under concurrency for different thread splits.
+
+Each split starts WORKERS worker processes at once (like `uvicorn --workers`),
+every one running CONCURRENCY request threads that encode a questionnaire and
+score the corpus for DURATION seconds, with the given intra-op/BLAS thread
+count per worker.
+
+    python -m tools.thread_layout_benchmark --workers 4 --threads 1 2 4
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+from cpu_layout import BLAS_ENV_VARS, available_cpus
+
+
+def run_worker(args):
+    """Child process: hammer encode + scoring from CONCURRENCY threads, print latencies as JSON."""
+    import threading
+    import time
+
+    import corpus
+    import embedding
+    from recommendation import build_query_vector
+    from tools.common import QUERY_SET
+
+    index = corpus.load_index()
+    model = embedding.get_model()
+    for answers in QUERY_SET:  # warmup
+        index.interest_scores(build_query_vector(answers, model))
+
+    samples = []
+    deadline = time.perf_counter() + args.duration
+
+    def loop(offset):
+        i = offset
+        while time.perf_counter() < deadline:
+            start = time.perf_counter()
+            index.interest_scores(build_query_vector(QUERY_SET[i % len(QUERY_SET)], model))
+            samples.append(time.perf_counter() - start)
+            i += 1
+
+    threads = [threading.Thread(target=loop, args=(n,)) for n in range(args.concurrency)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    print(json.dumps(samples))
+
+
+def run_split(args, threads: int) -> dict:
+    from tools.common import percentiles_ms
+
+    env = {k: v for k, v in os.environ.items() if k not in BLAS_ENV_VARS}
+    env.update({"WEB_CONCURRENCY": str(args.workers), "ENCODER_THREADS": str(threads)})
+    command = [sys.executable, "-m", "tools.thread_layout_benchmark", "--worker",
+               "--duration", str(args.duration), "--concurrency", str(args.concurrency)]
+    procs = [subprocess.Popen(command, env=env, stdout=subprocess.PIPE, text=True) for _ in range(args.workers)]
+    samples = []
+    for proc in procs:
+        out, _ = proc.communicate()
+        samples += json.loads(out.strip().splitlines()[-1])
+    return {"threads_per_worker": threads, "total_threads": threads * args.workers,
+            "requests": len(samples), "throughput_rps": round(len(samples) / args.duration, 1),
+            **percentiles_ms(samples)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, default=int(os.getenv("WEB_CONCURRENCY", "2")))
+    parser.add_argument("--threads", type=int, nargs="+", help="intra-op threads per worker to compare")
+    parser.add_argument("--concurrency", type=int, default=4, help="concurrent requests per worker")
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds per split")
+    parser.add_argument("--worker", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        run_worker(args)
+        return
+
+    cpus = available_cpus()
+    # Default: the oversubscribed layout (every worker uses every CPU) against the even split and one thread
+    splits = args.threads or sorted({1, max(1, cpus // args.workers), cpus})
+    report = {"cpus": cpus, "workers": args.workers, "concurrency_per_worker": args.concurrency,
+              "splits": [run_split(args, threads) for threads in splits]}
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()